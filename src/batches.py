@@ -1,11 +1,16 @@
 import csv
+import hashlib
+import itertools
 
 
-from metrics import get_word_len_avr
+import json
 import os
+import corpus_stats
 import utility as ut
 from utility import cur_dir
 import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from dictionary import Dictionary, dic_tar
 from dictionary import dic_src
 
@@ -13,6 +18,10 @@ from dictionary import dic_src
 # used to store directory of script file
 output_filename = "output/batch"
 save_batch = None
+# tokens with fixed indices, kept when pruning the vocabulary
+special_tokens = ("§$", "<s>", "</s>", "<unk>")
+# ratio of target to source sentence length, see get_length_ratio
+length_ratio = None
 
 # to create our batches we build the three multidimensional arrays
 # S : B x (w * 2 + 1)
@@ -51,6 +60,14 @@ class Batch:
     def size(self, var):
         self._size = var
 
+    @classmethod
+    def from_arrays(cls, source, target, label):
+        """returns batch backed by the numpy arrays S, T and L"""
+        batch = cls()
+        batch._source, batch._target, batch._label = source, target, label
+        batch._size = len(label)
+        return batch
+
     def append_s(self, sor_line):
         self._source.append(sor_line)
 
@@ -85,55 +102,83 @@ def get_pred_batch(line, dev=0, window=2):
     # create source window 2*window+1 and extend it using the alignment.
     # get firstly line deviation if not given
     if dev == 0:
-        c_en, c_de = 0, 0
-        dev_en = 0
-        for f in os.listdir("./train_data"):
-            if f.endswith(".de"):
-                dev += get_word_len_avr("./train_data/" + f)
-                c_de += 1
-            if f.endswith(".en"):
-                dev_en += get_word_len_avr("./train_data/" + f)
-                c_en += 1
-        # calculate deviaton
-        dev = (dev_en / c_en) / (dev / c_de)
+        dev = get_length_ratio()
 
     # print(round(dev * len(line)), (dev * len(line)))
     art_tar = [0 for _ in range(round(dev * len(line)))]
     return create_batch(Batch(), line, art_tar, w=window)
 
 
+def get_length_ratio(data_dir=os.path.join(cur_dir, "train_data")):
+    """
+    returns average english sentence length divided by the german one,
+    computed once from the files in data_dir and stored next to the
+    dictionaries, loaded once per process
+    """
+    global length_ratio
+    if length_ratio is None:
+        length_ratio = load_length_ratio(data_dir)
+    return length_ratio
+
+
+def load_length_ratio(data_dir):
+    """reads the stored length ratio, computes it if data_dir has changed"""
+    file_des = os.path.join(cur_dir, "dictionaries", "length_ratio.json")
+    files = [os.path.join(data_dir, f) for f in sorted(os.listdir(data_dir))]
+    if os.path.exists(file_des) and all(
+        os.path.getmtime(f) <= os.path.getmtime(file_des) for f in files
+    ):
+        with open(file_des, "r", encoding="utf-8") as in_file:
+            return json.load(in_file)["ratio"]
+
+    # average of the average sentence length of each file
+    avr = {}
+    for lang in ("de", "en"):
+        stats = corpus_stats.get_all_stats([f for f in files if f.endswith("." + lang)])
+        avr[lang] = sum(s.avg_length() for s in stats) / len(stats)
+    ratio = avr["en"] / avr["de"]
+    with open(file_des + ".tmp", "w", encoding="utf-8") as write_f:
+        json.dump({"ratio": ratio, "avg_length": avr}, write_f)
+    os.replace(file_des + ".tmp", file_des)
+    return ratio
+
+
+def get_batch_rows(batch):
+    """returns S, T and L of batch as lists, also if it holds numpy arrays"""
+    return [
+        rows.tolist() if isinstance(rows, np.ndarray) else rows
+        for rows in (batch.source, batch.target, batch.label)
+    ]
+
+
 def save_batch_as_int(batch):
     """writes the batch as ints inside batch.csv"""
     global output_filename
     file_des = os.path.join(cur_dir, output_filename)
-    with open(file_des, "a+", newline="", encoding="utf-8") as batch_csv:
-        writer = csv.writer(batch_csv)
-        for (s, t, l) in zip(batch.source, batch.target, batch.label):
-            writer.writerow([str(s)[1:-1], str(t)[1:-1], l])
-        writer.writerow([])
-    batch_csv.close()
+    writer = csv.writer(ut.writer_pool.get(file_des))
+    for (s, t, l) in zip(*get_batch_rows(batch)):
+        writer.writerow([", ".join(map(str, s)), ", ".join(map(str, t)), l])
+    writer.writerow([])
 
 
 def save_batch_as_string(batch):
     """writes the batch as strings inside batch.csv"""
     global output_filename
     file_des = os.path.join(cur_dir, output_filename)
-    with open(file_des, "a+", newline="", encoding="utf-8") as batch_csv:
-        writer = csv.writer(batch_csv)
-
-        tar_keys = dic_tar.get_keys()
-        src_keys = dic_src.get_keys()
-
-        for (s, t, l) in zip(batch.source, batch.target, batch.label):
-            writer.writerow(
-                [
-                    " ".join([src_keys[i] for i in s]),
-                    " ".join([tar_keys[i] for i in t]),
-                    tar_keys[l],
-                ]
-            )
-        writer.writerow([])
-    batch_csv.close()
+    writer = csv.writer(ut.writer_pool.get(file_des))
+
+    tar_keys = dic_tar.get_keys()
+    src_keys = dic_src.get_keys()
+
+    for (s, t, l) in zip(*get_batch_rows(batch)):
+        writer.writerow(
+            [
+                " ".join([src_keys[i] for i in s]),
+                " ".join([tar_keys[i] for i in t]),
+                tar_keys[l],
+            ]
+        )
+    writer.writerow([])
 
 
 # target and source passed as lines
@@ -170,33 +215,133 @@ def create_batch(batch, source, target, w=2):
     return batch
 
 
-def get_word_index(src, trg):
+def get_lines_as_list(nums, offsets):
     """
-    uses dictionaries to replace strings with the index
+    splits the flat index array at offsets into a list of lines
+    """
+    nums = nums.tolist()
+    offsets = offsets.tolist()
+    return [nums[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+def build_vocab(src, trg, min_count=1, max_size=None, chunk_size=10000):
+    """
+    counts the words of the training lines, prunes and freezes both
+    dictionaries, other words are mapped to <unk> afterwards.
+    src and trg can be iterators, e.g. ut.iter_lines, they are counted
+    chunk_size lines at a time
+    """
+    for dic, lines in ((dic_src, src), (dic_tar, trg)):
+        dic.update(*special_tokens)
+        lines = iter(lines)
+        for chunk in iter(lambda: list(itertools.islice(lines, chunk_size)), []):
+            dic.translate_to_nums(chunk)
+        dic.prune(min_count, max_size, keep=special_tokens)
+        dic.freeze("<unk>")
+
+
+def get_word_arrays(src, trg):
+    """
+    uses dictionaries to replace strings with the index,
+    returns flat index arrays and line offsets of src and trg
     """
-    target, source = [], []
     dic_src.update("§$", "§$")
     dic_tar.update("§$", "§$")
     dic_src.update("<s>", "</s>")
     dic_tar.update("<s>", "</s>")
 
-    # creating index for each word
-    # mapping lines to list of words
-    for trg_l, src_l in zip(trg, src):
-        tmp_t, tmp_s = [], []
-        for trg_w in trg_l.split():
-            dic_tar.update(trg_w)
-            tmp_t.append(dic_tar.get_index(trg_w))
-        for src_w in src_l.split():
-            dic_src.update(src_w)
-            tmp_s.append(dic_src.get_index(src_w))
-        target.append(tmp_t)
-        source.append(tmp_s)
+    # creating index for each word in one pass over all lines
+    # zip stops at the shorter file, lines past it are left out
+    n = min(len(src), len(trg))
+    src_nums, src_offsets = dic_src.translate_to_nums(src[:n])
+    trg_nums, trg_offsets = dic_tar.translate_to_nums(trg[:n])
     # dic_src.store_dictionary("source_dictionary")
     # dic_tar.store_dictionary("target_dictionary")
+    return src_nums, src_offsets, trg_nums, trg_offsets
+
+
+def get_word_index(src, trg):
+    """
+    uses dictionaries to replace strings with the index
+    """
+    src_nums, src_offsets, trg_nums, trg_offsets = get_word_arrays(src, trg)
+    source = get_lines_as_list(src_nums, src_offsets)
+    target = get_lines_as_list(trg_nums, trg_offsets)
     return source, target
 
 
+def lookup_word_index(src, trg, unk="<unk>"):
+    """
+    like get_word_index, but only looks the words up, unknown words are
+    replaced with the unk of a frozen dictionary or with unk, and a mapped
+    dictionary is not copied into memory. dictionaries stored without unk
+    are indexed like get_word_index does
+    """
+    n = min(len(src), len(trg))
+    index = []
+    for dic, lines in ((dic_src, src[:n]), (dic_tar, trg[:n])):
+        if dic.unk_index is not None:
+            nums = dic.translate_to_nums(lines)
+        elif unk in dic:
+            nums = dic.translate_to_nums(lines, unk)
+        else:
+            dic.update("§$", "<s>", "</s>")
+            nums = dic.translate_to_nums(lines)
+        index.append(get_lines_as_list(*nums))
+    return tuple(index)
+
+
+def get_padded(nums, offsets, tokens, w, end_pad):
+    """
+    returns nums with w times tokens[0] (<s>) in front and end_pad[k] times
+    tokens[1] (</s>) after line k as one flat array, and the index where
+    each padded line starts
+    """
+    lens = np.diff(offsets)
+    padded_lens = w + lens + end_pad
+    starts = np.cumsum(padded_lens) - padded_lens
+
+    padded = np.full(padded_lens.sum(), tokens[1], dtype=nums.dtype)
+    padded[(starts[:, None] + np.arange(w)).ravel()] = tokens[0]
+    padded[np.arange(len(nums)) + np.repeat(starts + w - offsets[:-1], lens)] = nums
+    return padded, starts
+
+
+def create_batch_arrays(src_nums, src_offsets, trg_nums, trg_offsets, w=2):
+    """
+    creates S (B x 2w+1), T (B x w) and L (B) of all lines at once from the
+    flat index arrays of get_word_arrays, with the same rows create_batch
+    appends for each pair of lines
+    """
+    src_tokens = (dic_src.get_index("<s>"), dic_src.get_index("</s>"))
+    tar_tokens = (dic_tar.get_index("<s>"), dic_tar.get_index("</s>"))
+    src_lens = np.diff(src_offsets)
+    rows = np.diff(trg_offsets) + 1  # one row for each word and </s>
+
+    # alignment of row i of a line is floor(i * (m / n)), as float like in
+    # alignment(), the source is padded with </s> up to the last window
+    ratio = src_lens / rows
+    max_bi = np.floor(rows * ratio).astype(np.int64)
+    src_pad = np.maximum(max_bi + w + 1 - src_lens, 0)
+    padded_src, src_starts = get_padded(src_nums, src_offsets, src_tokens, w, src_pad)
+    padded_trg, trg_starts = get_padded(
+        trg_nums, trg_offsets, tar_tokens, w, np.ones_like(rows)
+    )
+
+    # position i of every row inside its line
+    row_starts = np.cumsum(rows) - rows
+    i = np.arange(rows.sum()) - np.repeat(row_starts, rows)
+    b_i = np.floor(i * np.repeat(ratio, rows)).astype(np.int64)
+
+    trg_pos = np.repeat(trg_starts, rows) + i
+    source = sliding_window_view(padded_src, 2 * w + 1)[
+        np.repeat(src_starts, rows) + b_i
+    ]
+    target = sliding_window_view(padded_trg, w)[trg_pos]
+    label = padded_trg[trg_pos + w]
+    return source, target, label
+
+
 # as_string determines if batch is saved with int or strings
 # start and end are the range of lines we create batches for
 def create_batches(sor_file, tar_file, window=2, as_string=False, start=0, end=-1):
@@ -215,38 +360,114 @@ def create_batches(sor_file, tar_file, window=2, as_string=False, start=0, end=-
     else:
         save_batch = save_batch_as_int
         output_filename += "_int.csv"
-    # remove the batch.csv in output in case it exists
-    try:
-        os.remove(os.path.join(cur_dir, output_filename))
-    except:
-        print("No file, creating new file")
+    # batches are written to a temporary file which replaces
+    # the batch.csv in output once all batches are saved
+    file_des = os.path.join(cur_dir, output_filename)
+    ut.writer_pool.get(file_des, atomic=True)
 
     # store source and target file as list of words
     src = ut.read_from_file(sor_file, start, end)
     trg = ut.read_from_file(tar_file, start, end)
 
-    source, target = get_word_index(src, trg)
-
-    batch = Batch()
-    for s, t in zip(source, target):
-        batch = create_batch(batch, s, t, window)
-        if batch.size >= 200:
-            newbatch = Batch()
-            for i in range(200, batch.size):
-                newbatch.append_s(batch.source[200])
-                batch.source.remove(batch.source[200])
-                newbatch.append_l(batch.label[200])
-                batch.label.remove(batch.label[200])
-                newbatch.append_t(batch.target[200])
-                batch.target.remove(batch.target[200])
-                newbatch.size += 1
-                batch.size -= 1
-            # TODO bearbeitung des batches
-            batch = newbatch
-
-    # save last batch
-    if batch.size != 0:
+    arrays = create_batch_arrays(*get_word_arrays(src, trg), window)
+    progress = ut.Progress("batches saved", check_every=100)
+    for batch in iter_batches([arrays]):
         save_batch(batch)
+        progress.update()
+    progress.close()
+    ut.writer_pool.finalize(file_des)
+
+
+def iter_batches(chunks, batch_size=200):
+    """
+    yields batches of exactly batch_size rows from chunks of (S, T, L)
+    arrays, only the last batch may be smaller. batches inside a chunk are
+    views on it, rows left at the end of a chunk are copied once into a
+    preallocated batch that the next chunk fills up
+    """
+    rest, filled = None, 0
+    for arrays in chunks:
+        rows, pos = len(arrays[2]), 0
+        if filled:
+            pos = min(batch_size - filled, rows)
+            for buffer, array in zip(rest, arrays):
+                buffer[filled : filled + pos] = array[:pos]
+            filled += pos
+            if filled < batch_size:
+                continue
+            yield Batch.from_arrays(*rest)
+            filled = 0
+
+        while rows - pos >= batch_size:
+            yield Batch.from_arrays(*(a[pos : pos + batch_size] for a in arrays))
+            pos += batch_size
+
+        if pos < rows:
+            rest = [np.empty((batch_size,) + a.shape[1:], a.dtype) for a in arrays]
+            filled = rows - pos
+            for buffer, array in zip(rest, arrays):
+                buffer[:filled] = array[pos:]
+    if filled:
+        yield Batch.from_arrays(*(buffer[:filled] for buffer in rest))
+
+
+def iter_file_windows(sor_file, tar_file, window=2, chunk_size=10000, start=0, end=-1):
+    """
+    yields (S, T, L) int32 arrays of the lines start to end of sor_file
+    and tar_file, read and turned into windows chunk_size lines at a time
+    """
+    lines = min(len(ut.get_line_index(f)) - 1 for f in (sor_file, tar_file))
+    end = lines if end == -1 else min(end, lines)
+    for chunk in range(start, end, chunk_size):
+        chunk_end = min(chunk + chunk_size, end)
+        src = ut.read_from_file(sor_file, chunk, chunk_end)
+        trg = ut.read_from_file(tar_file, chunk, chunk_end)
+        arrays = create_batch_arrays(*get_word_arrays(src, trg), window)
+        yield tuple(array.astype(np.int32) for array in arrays)
+
+
+def get_window_cache(sor_file, tar_file, window=2, chunk_size=10000):
+    """
+    returns S, T and L of sor_file and tar_file as read only memmaps of .npy
+    files in the cache directory, written chunk by chunk on the first call.
+    they are keyed by the content of both files, both dictionaries, which
+    must be frozen (see build_vocab), and window
+    """
+    if dic_src.unk_index is None or dic_tar.unk_index is None:
+        raise ValueError("dictionaries are not frozen, see build_vocab")
+    key = hashlib.sha1(
+        " ".join(
+            [ut.get_file_hash(sor_file), ut.get_file_hash(tar_file)]
+            + [dic_src.get_hash(), dic_tar.get_hash(), str(window)]
+        ).encode("utf-8")
+    ).hexdigest()
+    paths = [ut.get_cache_path("windows_" + key + "_" + n + ".npy") for n in "STL"]
+
+    if not all(os.path.exists(path) for path in paths):
+        # one row for each target word and </s> of the lines of both files
+        lines = min(len(ut.get_line_index(f)) - 1 for f in (sor_file, tar_file))
+        target = ut.iter_lines(tar_file, 0, lines)
+        rows = sum(len(line.split()) + 1 for line in target)
+        shapes = [(rows, 2 * window + 1), (rows, window), (rows,)]
+        arrays = [
+            np.lib.format.open_memmap(
+                path + ".tmp", mode="w+", dtype=np.int32, shape=shape
+            )
+            for path, shape in zip(paths, shapes)
+        ]
+        pos = 0
+        for chunk in iter_file_windows(sor_file, tar_file, window, chunk_size):
+            for array, chunk_rows in zip(arrays, chunk):
+                array[pos : pos + len(chunk_rows)] = chunk_rows
+            pos += len(chunk[2])
+        for array in arrays:
+            array.flush()
+        # the files are renamed once all of them are written and closed
+        del arrays, array
+        for path in paths:
+            os.replace(path + ".tmp", path)
+
+    return tuple(np.load(path, mmap_mode="r") for path in paths)
 
 
 def get_next_batch(batch, s, t, w=2):
@@ -260,18 +481,18 @@ def get_next_batch(batch, s, t, w=2):
     # while batch.size < 200:
     #     batch = create_batch(batch, s, t, w)
 
-    # remove unnecessary lines from batch to maintain 200 lines per batch
+    # move lines past 200 to the next batch, to maintain 200 lines per batch
     if batch.size >= 200:
         newbatch = Batch()
-        for i in range(200, batch.size):
-            newbatch.append_s(batch.source[200])
-            batch.source.remove(batch.source[200])
-            newbatch.append_l(batch.label[200])
-            batch.label.remove(batch.label[200])
-            newbatch.append_t(batch.target[200])
-            batch.target.remove(batch.target[200])
-            newbatch.size += 1
-            batch.size -= 1
+        for rows, new_rows in (
+            (batch.source, newbatch.source),
+            (batch.target, newbatch.target),
+            (batch.label, newbatch.label),
+        ):
+            new_rows.extend(rows[200:])
+            del rows[200:]
+        newbatch.size = batch.size - 200
+        batch.size = 200
 
         # Hold on to the excesive lines for next batch
         return batch, newbatch
@@ -282,47 +503,117 @@ def get_next_batch(batch, s, t, w=2):
 
 def get_all_batches(source, target, w):
     batch = Batch()
+    progress = ut.Progress("sentences batched", total=len(source))
     for s, t in zip(source, target):
         batch = create_batch(batch, s, t, w)
+        progress.update()
+    progress.close()
     return batch
 
 
 def get_max_line(source, target):
-    src = ut.read_from_file(source)
-    tar = ut.read_from_file(target)
-    len_list = map((lambda x: len(x.split())), (src + tar))
-    return max(len_list)
+    lines = itertools.chain(ut.iter_lines(source), ut.iter_lines(target))
+    return max(len(line.split()) for line in lines)
+
+
+def fill_rows(out, nums, offsets, rows, col):
+    """
+    copies the lines rows of the flat index array nums into the rows of out,
+    starting at column col, returns the lengths of the lines
+    """
+    lens = offsets[rows + 1] - offsets[rows]
+    line = np.repeat(np.arange(len(rows)), lens)
+    pos = np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens)
+    out[line, pos + col] = nums[np.repeat(offsets[rows], lens) + pos]
+    return lens
+
+
+def get_rnn_arrays(src_nums, src_offsets, trg_nums, trg_offsets, rows=None):
+    """
+    returns source, target and label of the lines rows (default all) as
+    int32 arrays, padded with 0 to the longest of these lines:
+    source <s> s </s> 0.., target <s> t </s> 0.., label t </s> 0.. <s>
+    """
+    if rows is None:
+        rows = np.arange(len(src_offsets) - 1)
+    max_line = int(
+        max(
+            np.max(src_offsets[rows + 1] - src_offsets[rows], initial=0),
+            np.max(trg_offsets[rows + 1] - trg_offsets[rows], initial=0),
+        )
+    )
+    n = len(rows)
+    all_rows = np.arange(n)
+    start, end = dic_tar.get_index("<s>"), dic_tar.get_index("</s>")
+
+    source = np.zeros((n, max_line + 3), dtype=np.int32)
+    source[:, 0] = dic_src.get_index("<s>")
+    src_lens = fill_rows(source, src_nums, src_offsets, rows, 1)
+    source[all_rows, src_lens + 1] = dic_src.get_index("</s>")
+
+    target = np.zeros((n, max_line + 2), dtype=np.int32)
+    target[:, 0] = start
+    trg_lens = fill_rows(target, trg_nums, trg_offsets, rows, 1)
+    target[all_rows, trg_lens + 1] = end
+
+    label = np.zeros((n, max_line + 2), dtype=np.int32)
+    fill_rows(label, trg_nums, trg_offsets, rows, 0)
+    label[all_rows, trg_lens] = end
+    label[:, -1] = start
+    return source, target, label
+
+
+def get_bucket_bounds(lengths, token_budget):
+    """
+    cuts lines sorted by length into buckets, each as many lines as fit into
+    token_budget once padded to the longest line of the bucket (+3 tokens),
+    returns the start of every bucket and the end of the last
+    """
+    bounds = [0]
+    for i, length in enumerate(lengths.tolist(), 1):
+        if (i - bounds[-1]) * (length + 3) > token_budget and i - 1 > bounds[-1]:
+            bounds.append(i - 1)
+    bounds.append(len(lengths))
+    return bounds
+
+
+def get_rnn_buckets(src_nums, src_offsets, trg_nums, trg_offsets, token_budget):
+    """
+    groups the lines by length and returns a list of batches, each padded
+    only to the longest of its lines and holding about token_budget tokens
+    """
+    lengths = np.maximum(np.diff(src_offsets), np.diff(trg_offsets))
+    order = np.argsort(lengths, kind="stable")
+    bounds = get_bucket_bounds(lengths[order], token_budget)
+    return [
+        Batch.from_arrays(
+            *get_rnn_arrays(
+                src_nums, src_offsets, trg_nums, trg_offsets, order[start:end]
+            )
+        )
+        for start, end in zip(bounds, bounds[1:])
+        if end > start
+    ]
 
 
 def create_batch_rnn(source, target):
-    max_line = get_max_line(source, target)
+    """
+    returns one batch of all lines of the files source and target, padded
+    to the longest line of both files
+    """
     src = ut.read_from_file(source)
     tar = ut.read_from_file(target)
-    src, tar = get_word_index(src, tar)
-    batch = Batch()
-    for s, t in zip(src, tar):
-        batch.append_s(
-            list(
-                [dic_src.get_index("<s>")]
-                + s
-                + [dic_src.get_index("</s>")]
-                + [0 for _ in range(max_line - len(s) + 1)]
-            )
-        )
-        batch.append_t(
-            [dic_tar.get_index("<s>")]
-            + t
-            + [dic_tar.get_index("</s>")]
-            + [0 for _ in range(max_line - len(t))]
-        )
-        batch.append_l(
-            t
-            + [dic_tar.get_index("</s>")]
-            + [0 for _ in range(max_line - len(t))]
-            + [dic_tar.get_index("<s>")]
-        )
+    return Batch.from_arrays(*get_rnn_arrays(*get_word_arrays(src, tar)))
 
-    return batch
+
+def create_buckets_rnn(source, target, token_budget=200 * 47):
+    """
+    returns the lines of the files source and target as batches of similar
+    length, see get_rnn_buckets
+    """
+    src = ut.read_from_file(source)
+    tar = ut.read_from_file(target)
+    return get_rnn_buckets(*get_word_arrays(src, tar), token_budget)
 
 
 def main():
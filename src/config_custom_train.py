@@ -31,6 +31,21 @@ params = dict(
     ## print tensorboard
     tb="True",
 )
+# vocabulary built on the training data
+vocab = dict(
+    # words seen less often are mapped to <unk>
+    min_count=1,
+    # maximal size of each dictionary, sets the size of the softmax layer
+    # None keeps every word
+    max_size=None,
+)
+# input pipeline of the training and validation data
+data = dict(
+    # windows are built while training, chunk by chunk, so training starts
+    # right away. True builds them once into memory-mapped files before the
+    # first epoch, later runs on the same data and dictionaries map those
+    cache=False,
+)
 # search space for hyperparameter search
 hp_space = dict(
     # windowsize
@@ -0,0 +1,116 @@
+"""
+contains CorpusStats, the statistics of a text file computed in a single
+pass over its lines: running words, distinct words, sentence lengths and
+a histogram of the sentence lengths. results are cached by content hash.
+"""
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+from tabulate import tabulate
+import utility as ut
+
+
+class CorpusStats:
+    """statistics of one text file, words are separated by whitespace"""
+
+    def __init__(self):
+        self.lines = 0  # number of sentences
+        self.running_words = 0  # all words, repeated words count each time
+        self.distinct_words = 0
+        self.chars = 0  # characters of all lines without line breaks
+        self.max_length = 0  # words of the longest sentence
+        self.histogram = {}  # number of sentences by length in words
+
+    def avg_length(self):
+        """returns average number of words in a sentence"""
+        return self.running_words / self.lines if self.lines else 0.0
+
+    def avg_chars(self):
+        """returns average number of characters in a sentence"""
+        return self.chars / self.lines if self.lines else 0.0
+
+    def to_dict(self):
+        return vars(self)
+
+    @classmethod
+    def from_dict(cls, values):
+        stats = cls()
+        stats.__dict__.update(values)
+        # json stores the lengths of the histogram as strings
+        stats.histogram = {int(k): v for k, v in values["histogram"].items()}
+        return stats
+
+
+def count_stats(file):
+    """reads file once and returns its CorpusStats"""
+    vocab = collections.Counter()
+    lengths = collections.Counter()
+    stats = CorpusStats()
+    with open(file, "r", encoding="utf-8") as in_file:
+        for line in in_file:
+            line = line.rstrip("\r\n")
+            words = line.split()
+            vocab.update(words)
+            lengths[len(words)] += 1
+            stats.chars += len(line)
+
+    stats.lines = sum(lengths.values())
+    stats.running_words = sum(vocab.values())
+    stats.distinct_words = len(vocab)
+    stats.max_length = max(lengths, default=0)
+    stats.histogram = dict(sorted(lengths.items()))
+    return stats
+
+
+def get_stats(file):
+    """returns CorpusStats of file, cached by the hash of its content"""
+    cache_file = ut.get_cache_path("stats_" + ut.get_file_hash(file) + ".json")
+    if os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as in_file:
+            return CorpusStats.from_dict(json.load(in_file))
+
+    stats = count_stats(file)
+    with open(cache_file + ".tmp", "w", encoding="utf-8") as write_f:
+        json.dump(stats.to_dict(), write_f)
+    os.replace(cache_file + ".tmp", cache_file)
+    return stats
+
+
+def get_all_stats(files, jobs=1):
+    """returns CorpusStats of every file, files are read by jobs processes"""
+    if jobs > 1 and len(files) > 1:
+        with multiprocessing.Pool(min(jobs, len(files))) as pool:
+            return pool.map(get_stats, files)
+    return [get_stats(file) for file in files]
+
+
+def print_stats(files, jobs=1):
+    """prints a table with the statistics of files"""
+    rows = [
+        [
+            os.path.basename(file),
+            stats.lines,
+            stats.running_words,
+            stats.distinct_words,
+            round(stats.avg_length(), 2),
+            stats.max_length,
+            round(stats.avg_chars(), 2),
+        ]
+        for file, stats in zip(files, get_all_stats(files, jobs))
+    ]
+    headers = ["file", "lines", "words", "distinct", "avg len", "max len", "avg chars"]
+    print(tabulate(rows, headers=headers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="prints corpus statistics")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--jobs", type=int, default=1)
+    args = parser.parse_args()
+    print_stats(args.files, args.jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,16 +10,17 @@ import tensorflow as tf
 from tensorflow.keras.backend import argmax
 from tensorflow.keras.backend import get_value
 import numpy as np
-from encoder import revert_bpe
+from encoder import save_reverted
 from batches import (
     Batch,
+    get_length_ratio,
     get_pred_batch,
     create_batch,  # TODO remove later
-    get_word_index,  # TODO remove later
+    lookup_word_index,
 )
 import utility as ut
 import custom_model as cm
-from dictionary import dic_tar, dic_src
+from dictionary import dic_tar, dic_src, init_worker, share_dictionary
 from utility import cur_dir
 
 
@@ -46,10 +47,8 @@ def get_model(model):
 def create_text_files(line, k):
     """Used with beam decoder to store the created lines from predictions. """
     sentence = [[] for _ in range(k)]
-    keys_list = dic_tar.get_keys()
     for i in range(k):
-        str_lines = map(lambda x: keys_list[x], line[i][0])
-        sentence = " ".join(str_lines)
+        sentence = dic_tar.translate_to_words(line[i][0])
         ut.save_line_as_txt(
             os.path.join(cur_dir, "predictions", "beam_prediction" + str(i) + ".de"),
             sentence,
@@ -63,6 +62,7 @@ def greedy_decoder(test_model, source, target):
     t_1, t_2 = 0, 0
 
     #
+    progress = ut.Progress("sentences decoded", len(source), check_every=1)
     for _, (s, t) in enumerate(zip(source, target)):
         batch = create_batch(Batch(), s, t)
 
@@ -82,15 +82,16 @@ def greedy_decoder(test_model, source, target):
 
         greedy_values.append(tmp_greed)
         history.append(pred_values)
+        progress.update()
+    progress.close()
     print(history)
 
-    dic_keys = dic_tar.get_keys()
     path = os.path.join(cur_dir, "predictions", "greedy_prediction.de")
 
     # save greedy search decoder data
     ut.save_list_as_txt(
         path,
-        map(lambda x: [dic_keys[i] for i in x], greedy_values),
+        map(lambda x: dic_tar.translate_to_words(x).split(), greedy_values),
     )
     # beam_text = beam_decoder(pred_values, 3)
     # create_text_files(beam_text, k=3)
@@ -139,18 +140,36 @@ def beam_decoder(test_model, source, k):
     """finds the best translation scores using the beam decoder."""
     file_txt = []
 
-    # open pool for multiprocessing library
-    with multiprocessing.Pool(processes=8) as pool:
-        # multiprocessing lines
-        file_txt = pool.starmap(
-            inner_beam,
-            zip(
-                itertools.repeat(test_model),
-                range(10),
-                source[:10],
-                itertools.repeat(k),
-            ),
-        )
+    # loaded before the pool starts, so forked workers inherit it
+    get_length_ratio()
+    # workers map the dictionaries from shared memory instead of copying them
+    shared = [share_dictionary(dic) for dic in (dic_src, dic_tar)]
+    try:
+        # open pool for multiprocessing library
+        with multiprocessing.Pool(
+            processes=8,
+            initializer=init_worker,
+            initargs=tuple(shm.name for shm in shared),
+        ) as pool:
+            # multiprocessing lines
+            results = [
+                pool.apply_async(inner_beam, args)
+                for args in zip(
+                    itertools.repeat(test_model),
+                    range(10),
+                    source[:10],
+                    itertools.repeat(k),
+                )
+            ]
+            progress = ut.Progress("sentences decoded", len(results), check_every=1)
+            for result in results:
+                file_txt.append(result.get())
+                progress.update()
+            progress.close()
+    finally:
+        for shm in shared:
+            shm.close()
+            shm.unlink()
     # ensure the pipe is closed and wait for all
     # processes to finish their work
     pool.close()
@@ -162,29 +181,15 @@ def beam_decoder(test_model, source, k):
 
 def save_k_txt(file_txt, k):
     """provided an integer k and encoded text saves beam predictions into file system"""
-    keys_list = dic_tar.get_keys()
-    txt_list = [[] for _ in range(k)]
-    for elem in file_txt:
-        sentence = [[] for _ in range(k)]
-        for i in range(k):
-            str_lines = map(lambda x: keys_list[x], elem[i][0])
-            sentence = list(str_lines)
-            txt_list[i].append(sentence)
     for i in range(k):
-        ut.save_list_as_txt(
+        # BPE is undone while writing, the files need no extra pass
+        save_reverted(
             os.path.join(
                 cur_dir,
                 "en_de_translation",
                 "beam_k=" + str(k) + "_prediction" + str(i) + ".de",
             ),
-            txt_list[i],
-        )
-        revert_bpe(
-            os.path.join(
-                cur_dir,
-                "en_de_translation",
-                "beam_k=" + str(k) + "_prediction" + str(i) + ".de",
-            )
+            (dic_tar.translate_to_words(elem[i][0]) for elem in file_txt),
         )
 
 
@@ -220,8 +225,7 @@ def calc_scores(test_model, source, target):
             score += math.log(get_value(pred_values[iterator][act_tar_label]))
         scores.append(score)
 
-    dic_keys = dic_tar.get_keys()
-    tmp = list(map(lambda x: [dic_keys[i] for i in x], target[:10]))
+    tmp = list(map(lambda x: dic_tar.translate_to_words(x).split(), target[:10]))
 
     scores = list(map(lambda x: math.exp(x), scores))
 
@@ -244,7 +248,8 @@ def loader(model, val_src, val_tar, window=2, mode="b"):
     src = ut.read_from_file(val_src)
     tar = ut.read_from_file(val_tar)
 
-    source, target = get_word_index(src, tar)
+    # the stored dictionaries are only looked up, dev words become <unk>
+    source, target = lookup_word_index(src, tar)
     # batch = get_all_batches(source, target, window)
 
     if mode == "b":
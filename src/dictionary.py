@@ -2,10 +2,21 @@
 contains Dictionary class, which includes a bidirectional dictionary 
 for quick mapping between words and integer values.
 """
+import array
+import hashlib
+import mmap
 import os
+import struct
+import zlib
+from multiprocessing import shared_memory
+import numpy as np
 import utility as ut
 from utility import cur_dir
 
+TABLE_MAGIC = b"DIC2"  # first bytes of a binary dictionary
+# magic, number of words, blob size, hash slots, unk index (-1 if not frozen)
+TABLE_HEADER = "<4sIIIi"
+
 
 class Dictionary:
     """# Brain Storming:
@@ -18,55 +29,350 @@ class Dictionary:
 
     def __init__(self):
         self.bi_dict = {}  # creates dict
+        self.words = []  # words by index, reverse of bi_dict
+        self.table = None  # DictionaryTable used until the first update
+        self.counts = np.zeros(0, dtype=np.int64)  # word frequencies by index
+        self.unk_index = None  # index of unknown words once frozen
 
     # updater function
     def update(self, *vocabs):
-        """adds index and word to dictionary"""
+        """adds index and word to dictionary, unless it is frozen"""
+        if self.unk_index is not None:
+            return
+        if self.table is not None:
+            self.materialize()
         for vocab in vocabs:
             if vocab not in self.bi_dict:
-                self.bi_dict[vocab] = len(self.bi_dict)
+                self.bi_dict[vocab] = len(self.words)
+                self.words.append(vocab)
 
     def get_word(self, index):
         """gets word at index in dictionary"""
-        return list(self.bi_dict.keys())[index]
+        if self.table is not None:
+            return self.table.get_word(index)
+        return self.words[index]
 
     def get_index(self, word):
         """gets index of word in dictionary"""
+        if self.table is not None:
+            return self.table.get_index(word)
         return self.bi_dict[word]
 
+    def get(self, word, default=None):
+        """gets index of word, default if word is unknown"""
+        if self.table is not None:
+            return self.table.get(word, default)
+        return self.bi_dict.get(word, default)
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
     def get_keys(self):
-        return list(self.bi_dict.keys())
+        """returns list of words by index, do not modify it"""
+        if self.table is not None:
+            self.materialize()
+        return self.words
+
+    def get_hash(self):
+        """returns sha1 hex digest of the words, their order and unk"""
+        sha = hashlib.sha1(str(self.unk_index).encode("utf-8"))
+        if self.table is not None:
+            sha.update(self.table.buffer)
+        else:
+            sha.update(get_table_bytes(self.words, self.unk_index))
+        return sha.hexdigest()
 
     def __str__(self):
         """prints out dictionary"""
+        if self.table is not None:
+            self.materialize()
         return str(self.bi_dict)
 
     def __len__(self):
+        if self.table is not None:
+            return len(self.table)
         return len(self.bi_dict)
 
+    def load_table(self, table):
+        """replaces the content with a read only DictionaryTable"""
+        self.bi_dict, self.words = {}, []
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.table = table
+        self.unk_index = table.unk_index
+
+    def materialize(self):
+        """copies the words of the table into bi_dict and words"""
+        self.words = self.table.get_words()
+        self.bi_dict = {word: index for index, word in enumerate(self.words)}
+        self.table = None
+
+    def freeze(self, unk="<unk>"):
+        """stops adding words, unknown words are mapped to unk from now on"""
+        self.update(unk)
+        self.unk_index = self.get_index(unk)
+
+    def prune(self, min_count=1, max_size=None, keep=()):
+        """
+        keeps the words counted at least min_count times, at most max_size
+        words, and renumbers them by frequency. the words of keep are always
+        kept and get the first indices in the given order.
+        the unk of a frozen dictionary is kept as well
+        """
+        if self.unk_index is not None:
+            unk = self.get_word(self.unk_index)
+            keep = tuple(keep) + (unk,)
+        self.update(*keep)
+        words = self.get_keys()
+        counts = np.zeros(len(words), dtype=np.int64)
+        counts[: len(self.counts)] = self.counts
+        # a frozen dictionary adds no words, keep only what it has
+        keep = [self.bi_dict[word] for word in dict.fromkeys(keep) if word in self]
+
+        # stable sort, words with equal counts stay in order of appearance
+        ranked = np.argsort(-counts, kind="stable")
+        ranked = ranked[(counts[ranked] >= min_count) & ~np.isin(ranked, keep)]
+        order = np.concatenate((np.array(keep, dtype=np.int64), ranked))
+        if max_size is not None:
+            order = order[: max(max_size, len(keep))]
+
+        self.words = [words[i] for i in order]
+        self.bi_dict = {word: index for index, word in enumerate(self.words)}
+        self.counts = counts[order]
+        if self.unk_index is not None:
+            self.unk_index = self.bi_dict[unk]
+
     def store_dictionary(self, file_name):
-        """ Stores dictionary pairs into specified file file_name """
-        ut.save_list_as_txt(
-            os.path.join(cur_dir, "dictionaries", file_name), self.bi_dict.items()
-        )
+        """
+        Stores dictionary pairs into specified file file_name,
+        and as binary table next to it for get_stored, which also keeps
+        the dictionary frozen
+        """
+        file_des = os.path.join(cur_dir, "dictionaries", file_name)
+        words = self.get_keys()
+        ut.save_list_as_txt(file_des, ((word, i) for i, word in enumerate(words)))
+        compile_table(words, get_table_path(file_des), self.unk_index)
 
     def get_stored(self, file_name):
-        """ Used to retrieve stored dictionary from previous sessions """
-        dic_list = ut.read_from_file(os.path.join(cur_dir, "dictionaries", file_name))
-        for word in dic_list:
+        """
+        Used to retrieve stored dictionary from previous sessions,
+        maps the binary table if that is up to date
+        """
+        file_des = os.path.join(cur_dir, "dictionaries", file_name)
+        table_file = get_table_path(file_des)
+        table = None
+        if os.path.exists(table_file) and (
+            not os.path.exists(file_des)
+            or os.path.getmtime(table_file) >= os.path.getmtime(file_des)
+        ):
+            try:
+                table = open_table(table_file)
+            except ValueError:
+                pass  # table of an older format, the text file is read
+        if table is not None:
+            if len(self):
+                self.update(*table.get_words())
+                if table.unk_index is not None:
+                    self.freeze(table.get_word(table.unk_index))
+            else:
+                self.load_table(table)
+            return
+        for word in ut.iter_lines(file_des):
             self.update(word.split()[0])
 
-    def translate_to_nums(self, words):
+    def translate_to_nums(self, lines, unk=None):
         """
-        uses bi_dict to replace strings with their index
+        uses bi_dict to replace the words of lines with their index,
+        returns a flat array of all indices and an array of offsets,
+        line i is nums[offsets[i] : offsets[i + 1]].
+        unknown words are added to the dictionary and counted, if unk is
+        given or the dictionary is frozen they are replaced with unk instead
         """
-        pass
+        unk_index = self.unk_index if unk is None else self.get(unk, self.unk_index)
+        if unk is not None and unk_index is None:
+            # unk is added like any other unknown word would be
+            self.update(unk)
+            unk_index = self.get_index(unk)
+        lookup = self.bi_dict.get if self.table is None else self.table.get
+        nums = array.array("q")
+        offsets = array.array("q", [0])
+        for line in lines:
+            words = line.split()
+            if unk_index is None:
+                self.update(*words)
+                nums.extend(map(self.bi_dict.__getitem__, words))
+            else:
+                nums.extend(lookup(word, unk_index) for word in words)
+            offsets.append(len(nums))
+
+        nums = np.frombuffer(nums, dtype=np.int64)
+        if unk_index is None:
+            counts = np.bincount(nums, minlength=len(self))
+            counts[: len(self.counts)] += self.counts
+            self.counts = counts
 
-    def translate_to_words(self, numbers):
+        # use 16 bit indices if the dictionary is small enough
+        dtype = np.uint16 if len(self) <= 1 << 16 else np.int32
+        return nums.astype(dtype), np.frombuffer(offsets, dtype=np.int64)
+
+    def translate_to_words(self, numbers, offsets=None):
         """
-        uses bi_dict to replace numbers with their key
+        uses the word list to replace numbers with their key,
+        returns a line of words or, given offsets, a list of lines
         """
-        pass
+        # only the words of numbers are read, nothing is copied per call
+        get_word = self.words.__getitem__ if self.table is None else self.table.get_word
+        words = [get_word(i) for i in np.asarray(numbers, dtype=np.int64).tolist()]
+        if offsets is None:
+            return " ".join(words)
+        return [
+            " ".join(words[start:end]) for start, end in zip(offsets, offsets[1:])
+        ]
+
+
+def get_hash(word):
+    """returns a hash of the utf-8 bytes of word that is stable across runs"""
+    return zlib.crc32(word)
+
+
+def get_table_bytes(words, unk_index=None):
+    """
+    returns words as binary dictionary table: header (magic, number of words,
+    blob bytes, hash slots and unk index of a frozen dictionary), word
+    offsets, utf-8 blob and a hash index with linear probing, -1 marks an
+    empty slot
+    """
+    blob = bytearray()
+    offsets = array.array("I", [0])
+    for word in words:
+        blob += word.encode("utf-8")
+        offsets.append(len(blob))
+    blob += bytes(-len(blob) % 4)  # keep the hash index aligned
+
+    # at most half of the slots are used, a power of two to mask the hash
+    slots = 1
+    while slots < 2 * len(words):
+        slots *= 2
+    index = array.array("i", [-1]) * slots
+    for i in range(len(words)):
+        slot = get_hash(blob[offsets[i] : offsets[i + 1]]) & (slots - 1)
+        while index[slot] != -1:
+            slot = (slot + 1) & (slots - 1)
+        index[slot] = i
+
+    unk_index = -1 if unk_index is None else unk_index
+    header = struct.pack(
+        TABLE_HEADER, TABLE_MAGIC, len(words), len(blob), slots, unk_index
+    )
+    return b"".join((header, offsets.tobytes(), blob, index.tobytes()))
+
+
+def compile_table(words, file_des, unk_index=None):
+    """writes words as binary dictionary table into file_des"""
+    with open(file_des + ".tmp", "wb") as write_f:
+        write_f.write(get_table_bytes(words, unk_index))
+    os.replace(file_des + ".tmp", file_des)
+
+
+def get_table_path(file):
+    """returns path of the binary table of a stored dictionary"""
+    return file + ".bin"
+
+
+class DictionaryTable:
+    """read only view on a binary dictionary table, see get_table_bytes"""
+
+    def __init__(self, buffer, owner=None):
+        magic, words, blob_len, slots, unk_index = struct.unpack_from(
+            TABLE_HEADER, buffer
+        )
+        if magic != TABLE_MAGIC:
+            raise ValueError("no binary dictionary table")
+        self.unk_index = None if unk_index < 0 else unk_index
+
+        self.buffer = buffer
+        self.owner = owner  # keeps shared memory alive while it is mapped
+        view = memoryview(buffer)
+        pos = struct.calcsize(TABLE_HEADER)
+        self.offsets = view[pos : pos + 4 * (words + 1)].cast("I")
+        pos += 4 * (words + 1)
+        self.blob = view[pos : pos + blob_len]
+        pos += blob_len
+        self.index = view[pos : pos + 4 * slots].cast("i")
+        self.mask = slots - 1
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get_word(self, index):
+        """gets word at index"""
+        if not 0 <= index < len(self):
+            raise IndexError("dictionary index out of range")
+        return str(self.blob[self.offsets[index] : self.offsets[index + 1]], "utf-8")
+
+    def get(self, word, default=None):
+        """gets index of word, default if word is unknown"""
+        word = word.encode("utf-8")
+        slot = get_hash(word) & self.mask
+        while True:
+            index = self.index[slot]
+            if index == -1:
+                return default
+            if self.blob[self.offsets[index] : self.offsets[index + 1]] == word:
+                return index
+            slot = (slot + 1) & self.mask
+
+    def get_index(self, word):
+        """gets index of word"""
+        index = self.get(word)
+        if index is None:
+            raise KeyError(word)
+        return index
+
+    def get_words(self):
+        """returns all words ordered by index"""
+        blob, offsets = bytes(self.blob), self.offsets.tolist()
+        return [blob[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+
+    def close(self):
+        """releases the views and the shared memory they point into"""
+        for view in (self.offsets, self.blob, self.index):
+            view.release()
+        if self.owner is not None:
+            self.owner.close()
+
+
+def open_table(file):
+    """maps the binary dictionary table in file"""
+    with open(file, "rb") as in_file:
+        return DictionaryTable(
+            mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+        )
+
+
+def share_dictionary(dic):
+    """
+    copies dic as binary table into a new shared memory block and returns it,
+    the caller closes and unlinks it once the workers are done
+    """
+    if dic.table is not None:
+        data = dic.table.buffer
+    else:
+        data = get_table_bytes(dic.get_keys(), dic.unk_index)
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    shm.buf[: len(data)] = data
+    return shm
+
+
+def attach_dictionary(dic, name):
+    """lets dic look up words in the shared table name without copying it"""
+    shm = shared_memory.SharedMemory(name=name)
+    dic.load_table(DictionaryTable(shm.buf, owner=shm))
+
+
+def init_worker(src_name, tar_name):
+    """pool initializer, maps the shared dictionaries into dic_src and dic_tar"""
+    attach_dictionary(dic_src, src_name)
+    attach_dictionary(dic_tar, tar_name)
 
 
 ###  Globals
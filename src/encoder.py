@@ -1,8 +1,16 @@
+import argparse
+import bisect
+import csv
+import functools
+import heapq
+import itertools
+import multiprocessing
 import dictionary
 import sys, time, threading
 import utility
 import os
 import ntpath
+from tabulate import tabulate
 
 # Globals
 # testing dictionary
@@ -24,11 +32,11 @@ class Table:
         return self._pair_freq
 
     # use to save pairs and their frequency
-    def update_pairs(self, symbol_pair):
+    def update_pairs(self, symbol_pair, freq=1):
         if symbol_pair in self._pair_freq:
-            self._pair_freq[symbol_pair] += 1
+            self._pair_freq[symbol_pair] += freq
         else:
-            self._pair_freq[symbol_pair] = 1
+            self._pair_freq[symbol_pair] = freq
 
     # use to delete pairs
     def rm_pair(self, symbol_pair):
@@ -55,16 +63,81 @@ class Table:
         print("")
 
 
+def get_shards(items, jobs):
+    """splits items into jobs consecutive shards"""
+    size = -(-len(items) // jobs)
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def get_word_key(word):
+    """word format: the word "lesen" becomes "l e s e n</w>" etc"""
+    return " ".join(list(word)) + "</w>"
+
+
+def count_lines(lis_lines):
+    """returns dict of word frequencies in lis_lines, in order of occurrence"""
+    word_freq = {}
+    for line in lis_lines:
+        for word in line.split():
+            word_freq[word] = word_freq.get(word, 0) + 1
+    return word_freq
+
+
+def add_counts(word_freq, counts):
+    """adds the word frequencies of each dict in counts to word_freq"""
+    for chunk_freq in counts:
+        for word, freq in chunk_freq.items():
+            word_freq[word] = word_freq.get(word, 0) + freq
+
+
 # contruct a table of words from the list of passed words
 def get_words(lis_lines):
-    """returns Table of words from the list of passed words"""
+    """
+    returns Table of words from the list of passed words,
+    count_words counts files with jobs processes
+    """
     word_tab = Table()
-    lis_words = " ".join(lis_lines).split()
-    for word in lis_words:
+    for word, freq in count_lines(lis_lines).items():
         # the Table structure updates itself by incrementing the number of x
         # occurences for some word w
-        # word format: the word "lesen" becomes "l e s e n</w>" etc
-        word_tab.update_pairs(" ".join(list(word)) + "</w>")  # t h e</w>
+        word_tab.update_pairs(get_word_key(word), freq)  # t h e</w>
+    return word_tab
+
+
+def count_words(file, jobs=1):
+    """
+    returns Table of words in file, the file is streamed in chunks of lines.
+    the counts are cached by the content hash of file, so later runs
+    skip reading the corpus
+    """
+    cache_file = utility.get_cache_path(
+        "words_" + utility.get_file_hash(file) + ".txt"
+    )
+    word_freq = {}
+    if os.path.exists(cache_file):
+        for line in utility.read_from_file(cache_file):
+            word, freq = line.split()
+            word_freq[word] = int(freq)
+    else:
+        chunks = utility.read_chunks(file)
+        if jobs > 1:
+            with multiprocessing.Pool(processes=jobs) as pool:
+                add_counts(
+                    word_freq,
+                    utility.ordered_map(pool, count_lines, chunks, 4 * jobs),
+                )
+        else:
+            add_counts(word_freq, map(count_lines, chunks))
+
+        # write to a temporary file first, so an interrupted run leaves no cache
+        with open(cache_file + ".tmp", "w", encoding="utf-8") as write_f:
+            for word, freq in word_freq.items():
+                write_f.write(word + " " + str(freq) + "\n")
+        os.replace(cache_file + ".tmp", cache_file)
+
+    word_tab = Table()
+    for word, freq in word_freq.items():
+        word_tab.tabular[get_word_key(word)] = freq
     return word_tab
 
 
@@ -99,135 +172,606 @@ def merge_sqnce(word_tab, max_pair):
     return tmp_table
 
 
-# FIXME change name, as op_sqnce is redundant
-def get_op_sequences(file, n):
-    op_squences = []  # sequence of operations
+class Learner:
+    """
+    learns merge operations incrementally:
+    keeps the pair counts in a heap and an index from pairs to the words
+    containing them, so each merge only touches the affected words
+    """
 
-    # list of lines in file
-    lis_lines = utility.read_from_file(file)
-    word_tab = get_words(lis_lines)  # table of words in file
+    def __init__(self, word_tab, jobs=1):
+        self.keys = list(word_tab.tabular)
+        self.words = [key.split() for key in self.keys]  # segmented words
+        self.freqs = list(word_tab.tabular.values())
+        self.pair_freq = {}  # pair -> frequency
+        self.pair_words = {}  # pair -> ids of words containing pair
+        self.boundaries = {}  # (last char, first char) -> pairs
+        self.heap = []  # (-frequency, first seen, pair)
+        self.op_sequences = []
+        self.frequencies = []  # frequency of each merged pair
+
+        # first count, shards of the word table are counted by a process pool
+        shard = list(zip(range(len(self.words)), self.words, self.freqs))
+        if jobs > 1 and len(shard) > 1:
+            with multiprocessing.Pool(processes=jobs) as pool:
+                counts = pool.map(count_pairs, get_shards(shard, jobs))
+        else:
+            counts = [count_pairs(shard)]
+
+        for pair_tab, pair_words in counts:
+            for pair, freq in pair_tab.tabular.items():
+                self.pair_freq[pair] = self.pair_freq.get(pair, 0) + freq
+            for pair, wids in pair_words.items():
+                self.index_pair(pair, *wids)
+        self.heap = [self.heap_entry(pair) for pair in self.pair_freq]
+        heapq.heapify(self.heap)
+
+    def index_pair(self, pair, *wids):
+        """remembers that words wids contain pair"""
+        if pair not in self.pair_words:
+            self.pair_words[pair] = set()
+            self.boundaries.setdefault((pair[0][-1], pair[1][0]), set()).add(pair)
+        self.pair_words[pair].update(wids)
+
+    def first_seen(self, pair):
+        """
+        (word id, char offset) of the first occurrence of pair,
+        this is the order in which the old Table saw the pairs
+        """
+        wid = min(self.pair_words[pair])
+        offset = 0
+        sym_list = self.words[wid]
+        for j in range(len(sym_list) - 1):
+            if sym_list[j] == pair[0] and sym_list[j + 1] == pair[1]:
+                break
+            offset += len(sym_list[j])
+        return wid, offset
+
+    def heap_entry(self, pair):
+        """returns the up to date heap entry of pair"""
+        return -self.pair_freq[pair], self.first_seen(pair), pair
 
-    for _ in range(n):
-        tmp_table = Table()  # temp structure
+    def get_highest_pair(self):
+        """
+        pops the most frequent pair, ties go to the pair seen first.
+        entries are only pushed when a pair gains occurrences, outdated
+        entries are corrected when they reach the top
+        """
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            pair = entry[2]
+            if pair not in self.pair_freq:
+                continue
+            current = self.heap_entry(pair)
+            if entry == current:
+                return pair
+            heapq.heappush(self.heap, current)
+        return None
+
+    def affected_words(self, max_pair):
+        """
+        ids of words changed by merge_sqnce, which replaces substrings
+        and therefore also joins symbols ending/starting with the pair
+        """
+        left, right = max_pair
+        wids = set()
+        for pair in self.boundaries.get((left[-1], right[0]), ()):
+            if pair[0].endswith(left) and pair[1].startswith(right):
+                wids |= self.pair_words[pair]
+        return wids
+
+    def merge(self):
+        """learns the next merge operation, returns it or None"""
+        max_pair = self.get_highest_pair()
+        if max_pair is None:
+            return None
+        op_sequence = " ".join(max_pair)
+        self.op_sequences.append(op_sequence)
+        self.frequencies.append(self.pair_freq[max_pair])
+
+        gained = set()
+        for wid in self.affected_words(max_pair):
+            old = self.words[wid]
+            new = " ".join(old).replace(op_sequence, "".join(max_pair)).split()
+            self.words[wid] = new
+
+            # only apply the difference in pair occurrences
+            old_occ, new_occ = occurrences(old), occurrences(new)
+            for _, pair in old_occ - new_occ:
+                freq = self.pair_freq[pair] - self.freqs[wid]
+                if freq > 0:
+                    self.pair_freq[pair] = freq
+                else:
+                    del self.pair_freq[pair]
+            for _, pair in new_occ - old_occ:
+                self.pair_freq[pair] = self.pair_freq.get(pair, 0) + self.freqs[wid]
+                self.index_pair(pair, wid)
+                gained.add(pair)
+            for pair in set(zip(old, old[1:])).difference(zip(new, new[1:])):
+                self.pair_words[pair].discard(wid)
+
+        for pair in gained:
+            if pair in self.pair_freq:
+                heapq.heappush(self.heap, self.heap_entry(pair))
+        return op_sequence
+
+
+def count_pairs(shard):
+    """
+    counts the symbol pairs in shard, a list of (word id, symbols, frequency),
+    returns Table of pair frequencies and the ids of words containing each pair
+    """
+    pair_tab = Table()
+    pair_words = {}
+    for wid, sym_list, freq in shard:
+        for pair in zip(sym_list, sym_list[1:]):
+            pair_tab.update_pairs(pair, freq)
+            pair_words.setdefault(pair, []).append(wid)
+    return pair_tab, pair_words
 
-        # go through keys
-        # count all occurrences of symbol pairs
-        for key, value in word_tab.tabular.items():
-            sym_list = key.split()
-            for j in range(len(sym_list) - 1):
-                pair = sym_list[j] + " " + sym_list[j + 1]
-                tmp_table.update_pairs(pair)
-                tmp_table.tabular[pair] += value - 1
 
-        # get maximum pair
-        if not tmp_table:
-            return word_tab
-        max_pair = tmp_table.get_highest_pair()
+def occurrences(sym_list):
+    """returns set of (char offset, pair) for the symbol pairs in sym_list"""
+    occ = set()
+    offset = 0
+    for j in range(len(sym_list) - 1):
+        occ.add((offset, (sym_list[j], sym_list[j + 1])))
+        offset += len(sym_list[j])
+    return occ
 
-        # add max to operation sequence
-        op_squences.append(str(max_pair))
 
-        # merge new values to word table
-        word_tab = merge_sqnce(word_tab, max_pair)
+# FIXME change name, as op_sqnce is redundant
+def get_op_sequences(file, n, jobs=1):
+    learner = Learner(count_words(file, jobs), jobs)  # table of words in file
+
+    for _ in range(n):
+        if learner.merge() is None:
+            break
 
-    # word_tab.toString()
-    return op_squences
+    return learner.op_sequences
 
 
-def create_op_sequences(file, n):
-    op_sequences = get_op_sequences(file, n)
-    file_des = os.path.join(
+def get_output_path(file, suffix):
+    """returns path in output for file, e.g. multi30k<suffix>.de"""
+    return os.path.join(
         utility.cur_dir,
         "output",
         ntpath.splitext(ntpath.basename(file))[0]
-        + "_op_sequence_"
-        + str(n)
-        + ntpath.splitext(ntpath.basename(file))[1]
-        + ".csv",
+        + suffix
+        + ntpath.splitext(ntpath.basename(file))[1],
     )
-    utility.save_as_csv(file_des, op_sequences)
 
 
-#
+def save_state(learner, file_des, corpus_hash):
+    """
+    saves the learned merges with their frequencies and the segmented
+    word table, so learning can be resumed later
+    """
+    with open(file_des + ".tmp", "w", encoding="utf-8") as write_f:
+        write_f.write(corpus_hash + "\n")
+        write_f.write(str(len(learner.op_sequences)) + "\n")
+        for op_sequence, freq in zip(learner.op_sequences, learner.frequencies):
+            write_f.write(op_sequence + " " + str(freq) + "\n")
+        for sym_list, freq in zip(learner.words, learner.freqs):
+            write_f.write(str(freq) + " " + " ".join(sym_list) + "\n")
+    # replace the old state only once the new one is complete
+    os.replace(file_des + ".tmp", file_des)
+
+
+def load_state(file_des, corpus_hash):
+    """returns Learner saved in file_des, None if there is no state for the corpus"""
+    if not os.path.exists(file_des):
+        return None
+    lines = utility.read_from_file(file_des)
+    if lines[0] != corpus_hash:
+        return None
+
+    merges = int(lines[1])
+    word_tab = Table()
+    for line in lines[2 + merges :]:
+        freq, key = line.split(" ", 1)
+        word_tab.tabular[key] = int(freq)
 
+    learner = Learner(word_tab)
+    for line in lines[2 : 2 + merges]:
+        left, right, freq = line.split()
+        learner.op_sequences.append(left + " " + right)
+        learner.frequencies.append(int(freq))
+    return learner
 
-def subword_split(text_file, sequence_file):
+
+def learn_op_sequences(file, n, jobs=1, checkpoint=1000):
     """
-    runs subword split on text_file
+    returns Learner with (at least) n merges learned on file.
+    resumes from the saved state of a previous run and saves the state
+    every checkpoint merges, the state is kept in the cache directory
     """
-    lines_list = utility.read_from_file(text_file)
-    text = ""
+    corpus_hash = utility.get_file_hash(file)
+    state_file = utility.get_cache_path("bpe_state_" + corpus_hash + ".txt")
 
-    #
-    for line in lines_list:
-        for word in line.split():
-            text += " ".join(list(word)) + "</w> "
-        text += "\n"
+    learner = load_state(state_file, corpus_hash)
+    if learner is None:
+        learner = Learner(count_words(file, jobs), jobs)
 
-    # read operation sequence from file
-    op_sequences = utility.read_from_file(sequence_file)
+    learned = len(learner.op_sequences)
+    progress = utility.Progress("merges", total=n - learned, check_every=100)
+    while len(learner.op_sequences) < n:
+        if learner.merge() is None:
+            break
+        progress.update()
+        if len(learner.op_sequences) % checkpoint == 0:
+            save_state(learner, state_file, corpus_hash)
+    progress.close()
+    if len(learner.op_sequences) > learned:
+        save_state(learner, state_file, corpus_hash)
+    return learner
 
-    for sequence in op_sequences:
-        text = text.replace(sequence, sequence.replace(" ", ""))
 
-    text = text.replace(" ", "@@ ").replace("</w>@@", "")
-    file_des = os.path.join(
-        utility.cur_dir,
-        "output",
-        ntpath.splitext(ntpath.basename(text_file))[0]
-        + "_subword"
-        + ntpath.splitext(ntpath.basename(text_file))[1],
+def create_op_sequences(file, n, jobs=1, checkpoint=1000):
+    return create_all_op_sequences(file, [n], jobs, checkpoint)[0]
+
+
+def create_all_op_sequences(file, counts, jobs=1, checkpoint=1000, split_files=()):
+    """
+    learns max(counts) merges once and saves the op sequence of every
+    count in counts, as the first k merges of a run are the merges of a
+    run with k operations. each file in split_files is also split with
+    every op sequence. returns the paths of the op sequence files
+    """
+    op_sequences = learn_op_sequences(file, max(counts), jobs, checkpoint).op_sequences
+
+    # keep the old file names if only one count is requested
+    single = len(set(counts)) == 1
+
+    seq_files = []
+    for n in sorted(set(counts)):
+        file_des = get_output_path(file, "_op_sequence_" + str(n)) + ".csv"
+        utility.save_as_csv(file_des, op_sequences[:n])
+        seq_files.append(file_des)
+
+        for text_file in split_files:
+            suffix = "_subword" if single else "_subword_" + str(n)
+            subword_split(
+                text_file,
+                file_des,
+                file_des=get_output_path(text_file, suffix),
+                jobs=jobs,
+            )
+    return seq_files
+
+
+def count_joint_words(files):
+    """
+    reads files in one pass, chunk by chunk side by side, returns a shared
+    Table of their words and a dict of word frequencies for each file
+    """
+    file_freqs = [{} for _ in files]
+    shared_freq = {}
+    for chunks in itertools.zip_longest(*map(utility.read_chunks, files)):
+        for word_freq, chunk in zip(file_freqs, chunks):
+            if chunk is not None:
+                chunk_freq = count_lines(chunk)
+                add_counts(word_freq, [chunk_freq])
+                add_counts(shared_freq, [chunk_freq])
+
+    word_tab = Table()
+    for word, freq in shared_freq.items():
+        word_tab.tabular[get_word_key(word)] = freq
+    return word_tab, file_freqs
+
+
+def get_vocab_report(learner, files, file_freqs):
+    """
+    returns rows (file, words, subword types, subword tokens) for the
+    segmentation learned by learner, plus a row of the shared subwords
+    """
+    segmented = {
+        key.replace(" ", "")[: -len("</w>")]: sym_list
+        for key, sym_list in zip(learner.keys, learner.words)
+    }
+    rows, vocabs = [], []
+    for file, word_freq in zip(files, file_freqs):
+        vocab = set()
+        tokens = 0
+        for word, freq in word_freq.items():
+            vocab.update(segmented[word])
+            tokens += freq * len(segmented[word])
+        vocabs.append(vocab)
+        rows.append([ntpath.basename(file), len(word_freq), len(vocab), tokens])
+    rows.append(["shared", "", len(set.intersection(*vocabs)), ""])
+    return rows
+
+
+def create_joint_op_sequences(files, counts, jobs=1):
+    """
+    learns one op sequence for all files (e.g. source and target side),
+    their words are counted in one pass into a shared table.
+    saves the op sequence of every count in counts, prints the vocabulary
+    of each file and returns the paths of the op sequence files
+    """
+    word_tab, file_freqs = count_joint_words(files)
+    learner = Learner(word_tab, jobs)
+    progress = utility.Progress("merges", total=max(counts), check_every=100)
+    for _ in range(max(counts)):
+        if learner.merge() is None:
+            break
+        progress.update()
+    progress.close()
+
+    # e.g. output/multi30k_op_sequence_7000.de-en.csv
+    exts = "-".join(ntpath.splitext(file)[1][1:] for file in files)
+    seq_files = []
+    for n in sorted(set(counts)):
+        file_des = os.path.join(
+            utility.cur_dir,
+            "output",
+            ntpath.splitext(ntpath.basename(files[0]))[0]
+            + "_op_sequence_"
+            + str(n)
+            + "."
+            + exts
+            + ".csv",
+        )
+        utility.save_as_csv(file_des, learner.op_sequences[:n])
+        seq_files.append(file_des)
+
+    print("Vocabulary after", len(learner.op_sequences), "joint merges:")
+    print(
+        tabulate(
+            get_vocab_report(learner, files, file_freqs),
+            headers=["File", "Words", "Subword types", "Subword tokens"],
+            tablefmt="orgtbl",
+        )
     )
+    return seq_files
+
+
+class Segmenter:
+    """
+    applies learned merge operations to words: the merges are ranked by
+    their position in the op sequence and a word is segmented by merging
+    its lowest ranked pair until no pair is left. as most tokens of a text
+    are frequent words, segmentations are kept in a bounded LRU cache
+    """
+
+    def __init__(self, merges, cache_size=100000):
+        self.merges = list(merges)  # (left, right) symbol pairs
+        self.ranks = {}  # left symbol -> right symbol -> ranks
+        for rank, (left, right) in enumerate(self.merges):
+            self.ranks.setdefault(left, {}).setdefault(right, []).append(rank)
+        self.segment = functools.lru_cache(maxsize=cache_size)(self.segment_word)
+
+    def get_rank(self, left, right, last):
+        """
+        lowest rank after last of the merges applying to left and right.
+        as in learning (see Learner.affected_words) a merge joins
+        symbols ending with its left and starting with its right symbol
+        """
+        rank = len(self.merges)
+        for i in range(len(left)):
+            rights = self.ranks.get(left[i:])
+            if rights is None:
+                continue
+            for j in range(1, len(right) + 1):
+                ranks = rights.get(right[:j])
+                if ranks is not None:
+                    k = bisect.bisect_right(ranks, last)
+                    if k < len(ranks):
+                        rank = min(rank, ranks[k])
+        return rank
+
+    def segment_word(self, word):
+        """returns tuple of the subwords of word, last one ends with </w>"""
+        sym_list = get_word_key(word).split()
+        rank = -1
+        while len(sym_list) > 1:
+            # merges are applied in the order they were learned
+            rank = min(
+                self.get_rank(left, right, rank)
+                for left, right in zip(sym_list, sym_list[1:])
+            )
+            if rank == len(self.merges):
+                break
+            pair = self.merges[rank]
+            sym_list = " ".join(sym_list).replace(" ".join(pair), "".join(pair)).split()
+        return tuple(sym_list)
+
+    def split_line(self, line):
+        """returns line in subwords, subwords inside a word end with @@"""
+        return " ".join(
+            "@@ ".join(self.segment(word))[: -len("</w>")] for word in line.split()
+        )
+
+
+def read_op_sequences(sequence_file):
+    """returns list of merge operations saved by create_op_sequences"""
+    with open(sequence_file, "r", newline="", encoding="utf-8") as file_csv:
+        return [row[0] for row in csv.reader(file_csv) if row]
+
+
+def load_merges(sequence_file):
+    """returns the merges of sequence_file as (left, right) symbol pairs"""
+    return [tuple(seq.split()) for seq in read_op_sequences(sequence_file)]
+
+
+# Segmenter of a pool worker, see init_segmenter
+worker_segmenter = None
+
+
+def init_segmenter(sequence_file):
+    """loads the merges once per pool worker"""
+    global worker_segmenter
+    worker_segmenter = Segmenter(load_merges(sequence_file))
+
+
+def split_chunk(lines):
+    """runs subword split on a chunk of lines inside a pool worker"""
+    return [worker_segmenter.split_line(line) for line in lines]
+
+
+def subword_split(text_file, sequence_file, *, file_des=None, jobs=1, chunk_size=10000):
+    """
+    runs subword split on text_file, the options are keyword only so
+    main.py can dispatch on the positional arguments.
+    text_file is read and written in chunks of lines, with jobs > 1 the
+    chunks are split by a process pool and written in their original order
+    """
+    if file_des is None:
+        file_des = get_output_path(text_file, "_subword")
+
+    chunks = utility.read_chunks(text_file, chunk_size)
+    # no total, counting the lines first would be another pass over the file
+    progress = utility.Progress("lines segmented", check_every=1)
+    with open(file_des, "w", encoding="utf-8") as write_f:
+        if jobs > 1:
+            with multiprocessing.Pool(
+                processes=jobs, initializer=init_segmenter, initargs=(sequence_file,)
+            ) as pool:
+                for lines in utility.ordered_map(pool, split_chunk, chunks, 2 * jobs):
+                    write_f.write("\n".join(lines) + "\n")
+                    progress.update(len(lines))
+        else:
+            # read operation sequence from file
+            segmenter = Segmenter(load_merges(sequence_file))
+            for lines in chunks:
+                write_f.write(
+                    "\n".join(segmenter.split_line(line) for line in lines) + "\n"
+                )
+                progress.update(len(lines))
+    progress.close()
+
+
+def revert_line(line):
+    """undos BPE on line and removes the sentence markers"""
+    return line.replace("<s> ", "").replace("</s>", "").replace("@@ ", "")
+
+
+def revert_lines(lines):
+    """undos BPE lazily on an iterable of lines"""
+    for line in lines:
+        yield revert_line(line)
 
-    utility.save_as_txt(file_des, text)
+
+def revert_ids(sequences, dic):
+    """turns sequences of indices of dic into lines with BPE undone"""
+    keys = dic.get_keys()
+    for seq in sequences:
+        yield revert_line(" ".join(keys[i] for i in seq))
+
+
+def save_reverted(file_des, lines):
+    """writes lines to file_des with BPE undone"""
+    with open(file_des, "w", encoding="utf-8") as write_f:
+        for line in revert_lines(lines):
+            write_f.write(line + "\n")
 
 
 def revert_bpe(file):
     """undos the transformation done to file by BPE"""
-    # join all lines into one string separated by \n
-    reader = "\n".join(utility.read_from_file(file))
+    # write to a temporary file next to file, then replace file
+    lines = itertools.chain.from_iterable(utility.read_chunks(file))
+    save_reverted(file + ".tmp", lines)
+    os.replace(file + ".tmp", file)
 
-    # write original text back out > file
-    with open(file, "w", encoding="utf-8") as write_f:
-        reader = reader.replace("<s> ", "")
-        reader = reader.replace("</s>", "")
-        write_f.write(reader.replace("@@ ", ""))
 
+def revert_bpe_files(files):
+    """undos BPE in place for each of files"""
+    for file in files:
+        revert_bpe(file)
 
-def run_bpe(*oper):
-    for n in oper:  # replace list with op_number
-        # create_op_sequences(
-        #    os.path.join(utility.cur_dir, "data_exercise_3/multi30k.de"), n
-        # )
-        # create_op_sequences(
-        #    os.path.join(utility.cur_dir, "data_exercise_3/multi30k.en"), n
-        # )
 
-        subword_split(
-            os.path.join(utility.cur_dir, "data_exercise_3/multi30k.dev.de"),
-            os.path.join(
-                utility.cur_dir, "output", "multi30k_op_sequence_" + str(n) + ".de.csv"
-            ),
-        )
-        subword_split(
-            os.path.join(utility.cur_dir, "data_exercise_3", "multi30k.dev.en"),
-            os.path.join(
-                utility.cur_dir, "output", "multi30k_op_sequence_" + str(n) + ".en.csv"
-            ),
-        )
+def run_bpe(*oper, joint=False):
+    """
+    learns the merges for all numbers of operations in oper in one run,
+    with joint one op sequence is learned for both languages.
+    the dev files are split with the largest number of operations
+    """
+    files = {
+        lang: os.path.join(utility.cur_dir, "train_data", "multi30k." + lang)
+        for lang in ("de", "en")
+    }
+    dev_files = {
+        lang: os.path.join(utility.cur_dir, "test_data", "multi30k.dev." + lang)
+        for lang in ("de", "en")
+    }
+    if joint:
+        seq_file = create_joint_op_sequences(list(files.values()), oper)[-1]
+        for dev_file in dev_files.values():
+            subword_split(dev_file, seq_file)
+        return
+
+    for lang in ("de", "en"):
+        create_all_op_sequences(files[lang], oper, split_files=[dev_files[lang]])
     # revert_bpe("Abgabe 2/data_exercise_2/multi30k.de100")
 
 
 def rename_me():
     """reverts bpe for files in predictions"""
-    for i in range(5):
-        revert_bpe(
-            os.path.join(
-                os.curdir, "predictions", "beam_k=10_prediction" + str(i) + ".de"
-            )
-        )
+    revert_bpe_files(
+        os.path.join(os.curdir, "predictions", "beam_k=10_prediction" + str(i) + ".de")
+        for i in range(5)
+    )
     # run_bpe(7000)
 
 
+def main():
+    """command line interface, without arguments runs rename_me"""
+    parser = argparse.ArgumentParser(description="byte pair encoding")
+    commands = parser.add_subparsers(dest="command")
+
+    learn = commands.add_parser("learn", help="learn merge operations of a file")
+    learn.add_argument("file")
+    learn.add_argument(
+        "n", type=int, nargs="+", help="numbers of merge operations, learned in one run"
+    )
+    learn.add_argument(
+        "--split", nargs="*", default=[], help="files to split with each op sequence"
+    )
+    learn.add_argument(
+        "--jobs", type=int, default=1, help="processes used for counting"
+    )
+    learn.add_argument(
+        "--checkpoint", type=int, default=1000, help="save state every n merges"
+    )
+
+    split = commands.add_parser("split", help="run subword split on a file")
+    split.add_argument("text_file")
+    split.add_argument("sequence_file", help="op sequence csv of create_op_sequences")
+    split.add_argument("--out", help="output file, default output/<name>_subword")
+    split.add_argument("--jobs", type=int, default=1, help="processes used")
+
+    revert = commands.add_parser(
+        "revert", help="undo BPE in place, without files reads stdin to stdout"
+    )
+    revert.add_argument("files", nargs="*")
+
+    joint = commands.add_parser(
+        "joint", help="learn one op sequence for several files in one pass"
+    )
+    joint.add_argument("files", nargs="+", help="e.g. multi30k.de multi30k.en")
+    joint.add_argument("--n", type=int, nargs="+", required=True)
+    joint.add_argument("--jobs", type=int, default=1, help="processes used")
+
+    args = parser.parse_args()
+    if args.command == "joint":
+        create_joint_op_sequences(args.files, args.n, args.jobs)
+    elif args.command == "revert":
+        if args.files:
+            revert_bpe_files(args.files)
+        else:
+            for line in revert_lines(sys.stdin):
+                sys.stdout.write(line)
+    elif args.command == "split":
+        subword_split(
+            args.text_file, args.sequence_file, file_des=args.out, jobs=args.jobs
+        )
+    elif args.command == "learn":
+        create_all_op_sequences(
+            args.file, args.n, args.jobs, args.checkpoint, args.split
+        )
+    else:
+        rename_me()
+
+
 if __name__ == "__main__":
-    rename_me()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+streaming tf.data input for the feed forward model. windows are built per
+chunk of sentences while the model trains, instead of for the whole corpus
+up front, so memory stays bounded and nothing is embedded in the graph.
+"""
+import numpy as np
+import tensorflow as tf
+import batches
+import corpus_stats
+import utility as ut
+
+
+def get_output_signature(window):
+    """returns the signature of the ({"I0": S, "I1": T}, L) elements"""
+    return (
+        {
+            "I0": tf.TensorSpec(shape=(None, 2 * window + 1), dtype=tf.int32),
+            "I1": tf.TensorSpec(shape=(None, window), dtype=tf.int32),
+        },
+        tf.TensorSpec(shape=(None,), dtype=tf.int32),
+    )
+
+
+def get_batch_count(tar_file, batch_size=2000):
+    """returns number of full batches of the windows of tar_file"""
+    # every target word and </s> of a line is one row
+    stats = corpus_stats.get_stats(tar_file)
+    return (stats.running_words + stats.lines) // batch_size
+
+
+def get_dataset(
+    sor_file,
+    tar_file,
+    window=2,
+    batch_size=2000,
+    shards=4,
+    chunk_size=10000,
+    cache=False,
+):
+    """
+    returns tf.data.Dataset of ({"I0": S, "I1": T}, L) batches of sor_file
+    and tar_file, incomplete batches are dropped.
+    the lines are split into shards, each read and turned into windows by
+    its own generator, chunk_size lines at a time. the shards are
+    interleaved in a fixed order, so they are produced in parallel and
+    take/skip splits stay the same in every epoch.
+    the dictionaries must be frozen (see batches.build_vocab), the
+    generators only look up words.
+    with cache the windows are read from the memmaps of
+    batches.get_window_cache instead, which are built on first use
+    """
+    if batches.dic_src.unk_index is None or batches.dic_tar.unk_index is None:
+        raise ValueError("dictionaries are not frozen, see batches.build_vocab")
+    if cache:
+        return get_cached_dataset(sor_file, tar_file, window, batch_size, chunk_size)
+
+    lines = min(len(ut.get_line_index(f)) - 1 for f in (sor_file, tar_file))
+    bounds = np.linspace(0, lines, shards + 1).astype(np.int64)
+
+    def generate(start, end):
+        chunks = batches.iter_file_windows(
+            sor_file, tar_file, window, chunk_size, int(start), int(end)
+        )
+        for batch in batches.iter_batches(chunks, batch_size):
+            yield {"I0": batch.source, "I1": batch.target}, batch.label
+
+    signature = get_output_signature(window)
+    dataset = tf.data.Dataset.from_tensor_slices((bounds[:-1], bounds[1:]))
+    dataset = dataset.interleave(
+        lambda start, end: tf.data.Dataset.from_generator(
+            generate, args=(start, end), output_signature=signature
+        ),
+        cycle_length=shards,
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=True,
+    )
+    # batches at the end of a shard are smaller, rows are batched again
+    dataset = dataset.unbatch().batch(batch_size, drop_remainder=True)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def get_cached_dataset(sor_file, tar_file, window=2, batch_size=2000, chunk_size=10000):
+    """
+    returns the dataset of get_dataset from the window cache, the batches
+    are views on the memmaps, so rows are only read when they are used
+    """
+    arrays = batches.get_window_cache(sor_file, tar_file, window, chunk_size)
+
+    def generate():
+        for batch in batches.iter_batches([arrays], batch_size):
+            if batch.size == batch_size:
+                yield {"I0": batch.source, "I1": batch.target}, batch.label
+
+    dataset = tf.data.Dataset.from_generator(
+        generate, output_signature=get_output_signature(window)
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -2,12 +2,12 @@
 import os
 import sys
 import math
-import subprocess
 from tabulate import tabulate
 import ntpath
 
 try:  # keep this for metrics test
     import utility as ut
+    import corpus_stats
 except:
     pass
 
@@ -206,62 +206,18 @@ def met_per(datei1, datei2):
 
 
 def value_counter():
-    """uses bash lines to get values from files"""
+    """prints corpus statistics of the files given as arguments"""
     # Berechnen Sie folgende Korpus-Statistiken für Quell- und Zielseite der Testdaten
     # (Dateien newstest.de und newstest.en): Anzahl der laufenden Wörter, Anzahl verschiedener
     # Wörter, durchschnittliche Satzlänge. Setzen Sie dazu Unix-Tools wie sed und wc ein.
     # Anmerkung: Unter „laufenden Wörter“ ist die Gesamtanzahl an Wörtern gemeint, wobei
     # mehrfach Vorkommnisse eines gleichen Wortes auch mehrfach gezählt werden.
-    print("Word count of each file:")  # Gesamtanzahl an Wörtern
-    for file in sys.argv[1:]:
-        # count number of words
-        # wc -w file
-        subprocess.run(["wc", "-w", file])
-
-        # count number of words - no duplicates
-        get_num_words = "grep -wo '[[:alnum:]]\+' " + file + "| sort | uniq -c | wc -l"
-
-        # calculate the average length of sentences
-        get_avr_len = (
-            "awk '{total=length($0)+total; len=len+1;} END {print total/len}' " + file
-        )
-
-        # call subprocesses - bash
-        grep = subprocess.Popen(
-            get_num_words,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-        )
-        awk = subprocess.Popen(
-            get_avr_len,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-        )
-
-        # print outputs of each command
-        print(
-            " Number of different words",
-            grep.communicate()[0],
-            "Average Line Length:",
-            awk.communicate()[0],
-        )
+    corpus_stats.print_stats(sys.argv[1:], jobs=len(sys.argv[1:]))
 
 
 def get_word_len_avr(f_name):
     """given a file get average number of words in each line"""
-    cmd = "wc " + f_name + " | awk '{print $2/$1}'"
-    cmd = subprocess.Popen(
-        cmd,
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        universal_newlines=True,
-    )
-    return float(cmd.communicate()[0][:-2].replace(",", "."))
+    return corpus_stats.get_stats(f_name).avg_length()
 
 
 def main():
@@ -17,7 +17,7 @@ import random
 from tensorflow.python.framework.tensor_conversion_registry import get
 from tensorflow.python.ops.gen_math_ops import mod
 from tensorflow_addons.seq2seq import decoder
-from encoder import revert_bpe
+from encoder import save_reverted
 from batches import (
     Batch,
     create_batch,  # TODO remove later
@@ -25,7 +25,7 @@ from batches import (
 )
 import utility as ut
 import recurrent_nn as rnn
-from dictionary import dic_tar, dic_src
+from dictionary import dic_tar, dic_src, init_worker, share_dictionary
 from utility import cur_dir, read_from_file
 import tensorflow_addons as tfa
 
@@ -58,29 +58,15 @@ def get_model(source, batch_size=1):
 
 def save_k_txt(file_txt, k):
     """provided an integer k and encoded text saves beam predictions into file system"""
-    keys_list = dic_tar.get_keys()
-    txt_list = [[] for _ in range(k)]
-    for elem in file_txt:
-        sentence = [[] for _ in range(k)]
-        for i in range(k):
-            str_lines = map(lambda x: keys_list[x], elem[i][0])
-            sentence = list(str_lines)
-            txt_list[i].append(sentence)
     for i in range(k):
-        ut.save_list_as_txt(
+        # BPE is undone while writing, the files need no extra pass
+        save_reverted(
             os.path.join(
                 cur_dir,
                 "en_de_translation",
                 "beam_k=" + str(k) + "_prediction" + str(i) + ".de",
             ),
-            txt_list[i],
-        )
-        revert_bpe(
-            os.path.join(
-                cur_dir,
-                "en_de_translation",
-                "beam_k=" + str(k) + "_prediction" + str(i) + ".de",
-            )
+            (dic_tar.translate_to_words(elem[i][0]) for elem in file_txt),
         )
 
 
@@ -127,17 +113,33 @@ def beam_decoder(source, k):
     """finds the best translation scores using the beam decoder."""
     file_txt = []
 
-    # open pool for multiprocessing library
-    with multiprocessing.Pool(processes=8) as pool:
-        # multiprocessing lines
-        file_txt = pool.starmap(
-            translate_line,
-            zip(
-                range(10),
-                source[:10],
-                itertools.repeat(k),
-            ),
-        )
+    # workers map the dictionaries from shared memory instead of copying them
+    shared = [share_dictionary(dic) for dic in (dic_src, dic_tar)]
+    try:
+        # open pool for multiprocessing library
+        with multiprocessing.Pool(
+            processes=8,
+            initializer=init_worker,
+            initargs=tuple(shm.name for shm in shared),
+        ) as pool:
+            # multiprocessing lines
+            results = [
+                pool.apply_async(translate_line, args)
+                for args in zip(
+                    range(10),
+                    source[:10],
+                    itertools.repeat(k),
+                )
+            ]
+            progress = ut.Progress("sentences decoded", len(results), check_every=1)
+            for result in results:
+                file_txt.append(result.get())
+                progress.update()
+            progress.close()
+    finally:
+        for shm in shared:
+            shm.close()
+            shm.unlink()
     # ensure the pipe is closed and wait for all
     # processes to finish their work
     pool.close()
@@ -150,9 +152,7 @@ def beam_decoder(source, k):
 def rnn_pred_batch(source_list, target_list):
     """returns a batch from source file by padding all sentences"""
     for i, _ in enumerate(source_list):
-        tmp = [
-            dic_src.get_index(x) if x in dic_src.bi_dict else 3 for x in source_list[i]
-        ]
+        tmp = [dic_src.get(x, 3) for x in source_list[i]]
         source_list[i] = tmp
     source_list = list(map(lambda x: [1] + list(x) + [2], source_list))
 
@@ -225,7 +225,6 @@ def main():
     inputs = rnn_pred_batch(
         ["ein mann schläft in einem grünen raum auf einem sofa ."], target
     )
-    keys = dic_tar.get_keys()
     print(evaluate_sentence(inputs))
     print("done")
 
@@ -234,8 +233,7 @@ def main():
     for i, line in enumerate(src_file):
         print(i)
         tmp = evaluate_sentence(np.array([line]))
-        tmp = [keys[x] for x in tmp[0]]
-        translated_lines.append(" ".join(tmp[:-1]))
+        translated_lines.append(dic_tar.translate_to_words(tmp[0][:-1]))
         if i == 10:
             break
 
@@ -43,10 +43,12 @@ class Encoder(tf.keras.Model):
         output, h, c = self.lstm(em, initial_state=hidden)
         return output, h, c
 
-    def initialize_hidden_state(self):
+    def initialize_hidden_state(self, batch_size=None):
+        # bucketed batches differ in size, see batches.get_rnn_buckets
+        batch_size = batch_size or self.batch_size
         return [
-            tf.zeros((self.batch_size, self.num_units)),
-            tf.zeros((self.batch_size, self.num_units)),
+            tf.zeros((batch_size, self.num_units)),
+            tf.zeros((batch_size, self.num_units)),
         ]
 
 
@@ -71,11 +73,12 @@ class Decoder(tf.keras.Model):
         # Sampler
         self.sampler = tfa.seq2seq.sampler.TrainingSampler()
 
-        # Create attention mechanism with memory = None
+        # Create attention mechanism with memory = None, the lengths of the
+        # source lines are passed with the memory, see Translator.train_step
         self.attention_mechanism = self.build_attention_mechanism(
             self.dec_units,
             None,
-            self.batch_sz * [47 - 1],
+            None,
             self.attention_type,
         )
 
@@ -102,7 +105,7 @@ class Decoder(tf.keras.Model):
         """attention type: Which sort of attention (Bahdanau, Luong)
         dec_units: dimension of attention outputs
         memory: not tweaked yet!
-        memory_sequence_length: 1d array of shape (batch_size) with every element set to 47"""
+        memory_sequence_length: 1d array of shape (batch_size) of source lengths"""
 
         if attention_type == "bahdanau":
             return tfa.seq2seq.BahdanauAttention(
@@ -127,10 +130,12 @@ class Decoder(tf.keras.Model):
 
     def call(self, inputs, initial_state):
         x = self.embedding(inputs)
+        # batches are padded to their longest line, not a fixed length
+        shape = tf.shape(inputs)
         outputs, _, _ = self.decoder(
             x,
             initial_state=initial_state,
-            sequence_length=self.batch_sz * [47 - 1],
+            sequence_length=tf.fill([shape[0]], shape[1]),
         )
         return outputs
 
@@ -154,12 +159,15 @@ class Translator(tf.keras.Model):
             dec_input = targ[:, :-1]  # ignore 0 token
             real = targ[:, 1:]  # ignore <s> token
 
-            # attention mechanism - done
-            self.decoder.attention_mechanism.setup_memory(enc_output)
+            # attention mechanism - done, padding of the source is not attended
+            src_lens = tf.math.count_nonzero(inputs, axis=1, dtype=tf.int32)
+            self.decoder.attention_mechanism.setup_memory(
+                enc_output, memory_sequence_length=src_lens
+            )
 
             # initialise AttentionWrapper state as initial state for decoder
             decoder_init_state = self.decoder.build_initial_state(
-                self.decoder.batch_sz, [h, c], tf.float32
+                tf.shape(inputs)[0], [h, c], tf.float32
             )
             # pass input into decoder
             dec_output = self.decoder(dec_input, decoder_init_state)
@@ -215,9 +223,8 @@ def train_loop(epochs, data, batch_size, metric_rate, cp_rate):
     for epoch in range(epochs):
         loss = 0
         set_off = time.time()
-        hidden = model.encoder.initialize_hidden_state()
-
         for (i, batch) in enumerate(data):
+            hidden = model.encoder.initialize_hidden_state(batch[0].shape[0])
             # batch loss and epoch avr loss
             b_loss = model.train_step(batch, hidden)
             loss += b_loss
@@ -258,18 +265,43 @@ def train_loop(epochs, data, batch_size, metric_rate, cp_rate):
     return model
 
 
-def preprocess_data(en_path, de_path):
-    """called from main to prepare dataset before initiating training"""
+def get_bucket_dataset(en_path, de_path, token_budget):
+    """
+    returns dataset of (source, target) batches of lines of similar length,
+    each padded to its longest line, in a new random order every epoch
+    """
+    buckets = batches.create_buckets_rnn(de_path, en_path, token_budget)
+
+    def generate():
+        for i in np.random.permutation(len(buckets)):
+            yield buckets[i].source, buckets[i].target
+
+    spec = tf.TensorSpec(shape=(None, None), dtype=tf.int32)
+    data = tf.data.Dataset.from_generator(generate, output_signature=(spec, spec))
+    # keeps len(data) working for train_loop
+    data = data.apply(tf.data.experimental.assert_cardinality(len(buckets)))
+    return data.prefetch(tf.data.AUTOTUNE)
+
+
+def preprocess_data(en_path, de_path, token_budget=None):
+    """
+    called from main to prepare dataset before initiating training,
+    with token_budget the lines are batched by length, see get_bucket_dataset
+    """
     EPOCHS = 1
     BATCH_SZ = 200
     MET_RATE = 10
     CP_RATE = 1
 
+    if token_budget:
+        data = get_bucket_dataset(en_path, de_path, token_budget)
+        return (EPOCHS, data, BATCH_SZ, MET_RATE, CP_RATE)
+
     # prepare dataset
     data = batches.create_batch_rnn(de_path, en_path)
 
-    tarset = tf.data.Dataset.from_tensor_slices(np.array(data.target))
-    data = tf.data.Dataset.from_tensor_slices(np.array(data.source))
+    tarset = tf.data.Dataset.from_tensor_slices(data.target)
+    data = tf.data.Dataset.from_tensor_slices(data.source)
 
     # merge both input points
     data = tf.data.Dataset.zip((data, tarset))
@@ -289,7 +321,8 @@ def main():
     en_path = os.path.join(cur_dir, "train_data", "multi30k_subword.en")
     de_path = os.path.join(cur_dir, "train_data", "multi30k_subword.de")
     # batch = batches.create_batch_rnn(de_path, en_path)
-    epochs, data, sz, met, cp = preprocess_data(en_path, de_path)
+    # about as many tokens per batch as 200 lines padded to 47
+    epochs, data, sz, met, cp = preprocess_data(en_path, de_path, 200 * 47)
     model = train_loop(epochs, data, sz, met, cp)
     rnn_dec.main(model)
 
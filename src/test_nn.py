@@ -9,16 +9,14 @@
     # fully connected layer 2 / Projektion
     # Ausgabelayer: softmax layer.
 """
-import math
 import os
 import sys
 import datetime
-import numpy as np
 import tensorflow as tf
 from tensorflow.python.keras.backend import _LOCAL_DEVICES
 from kerastuner.tuners import RandomSearch
 import batches
-from batches import Batch, get_all_batches
+import input_data
 import utility as ut
 
 # from encoder import run_bpe
@@ -31,17 +29,10 @@ import decoder
 
 # globals sit here.
 from custom_model import (
-<<<<<<< HEAD:src/test_nn.py
     BleuCallback,
     MetricsCallback,
     WordLabelerModel,
     build_search_model,
-=======
-    MetricsCallback,
-    WordLabelerModel,
-    build_search_model,
-    ModelCheckpoint,
->>>>>>> 60332a317c1af37fbd460f82d930e957d4cc1d67:Abgabe 3/test_nn.py
 )
 from utility import cur_dir
 
@@ -104,16 +95,12 @@ def get_callback_list(cp_freq=1, tb_vis=False, lr_frac=False, is_val=False):
         embeddings_freq=1,
     )
 
-<<<<<<< HEAD:src/test_nn.py
     callback_list = [
         call_for_metrics,
         early_stopping,
         cp_callback,
         bleu_callback,
     ]
-=======
-    callback_list = [call_for_metrics, early_stopping, cp_callback]
->>>>>>> 60332a317c1af37fbd460f82d930e957d4cc1d67:Abgabe 3/test_nn.py
 
     if lr_frac:
         callback_list.append(learning_rate_reduction)
@@ -175,22 +162,21 @@ def run_nn(sor_file, tar_file, val_src, val_tar, window=2, val_on_dev=False):
     """
     Trains and validates training data.
     """
-    batch = Batch()
     # BUG: REQ das Label muss während das lernen immer bekannt sein. S9 Architektur in letzte VL
 
-    # store source and target file as list of words
-    src = ut.read_from_file(sor_file)
-    trg = ut.read_from_file(tar_file)
-    # store source and target file as list of words
-    val_src = ut.read_from_file(val_src)
-    val_trg = ut.read_from_file(val_tar)
-
-    # get word mapping for both training files and index files
-    source, target = batches.get_word_index(src, trg)
-    batch = get_all_batches(source, target, window)
+    # count the training words first, words pruned from the vocabulary and
+    # words only seen in the validation files are mapped to <unk>.
+    # the files are streamed, no line list of the corpus is kept
+    batches.build_vocab(
+        ut.iter_lines(sor_file), ut.iter_lines(tar_file), **config.vocab
+    )
+    batches.dic_src.store_dictionary("source_dictionary")
+    batches.dic_tar.store_dictionary("target_dictionary")
 
-    # get word mapping for both validation files and index files
-    val_source, val_target = batches.get_word_index(val_src, val_trg)
+    # windows of training and validation files are built chunk by chunk
+    # while training, or mapped from the window cache, see config.data
+    dataset = input_data.get_dataset(sor_file, tar_file, window, **config.data)
+    val_dataset = input_data.get_dataset(val_src, val_tar, window, **config.data)
 
     # Modell is a sub class from keras.Model()
     # Modell() in custom_model.py
@@ -200,27 +186,12 @@ def run_nn(sor_file, tar_file, val_src, val_tar, window=2, val_on_dev=False):
     train_model.compile_model()
     print(train_model.summary())
 
-    #  creates tensors from lists
-    feed_src = np.array(batch.source)
-    feed_tar = np.array(batch.target)
-
-    output_tar = []
-    output_tar = np.array(batch.label)
-
     # train_model.model = tf.keras.models.load_model(
     #     "training_1/cp.ckpt", custom_objects={"perplexity": Perplexity}
     # )
 
-    ## dictionary to specify inputs at each input point in NN
-    input_list = {"I0": feed_src, "I1": feed_tar}
-    dataset = tf.data.Dataset.from_tensor_slices(input_list)
-
-    # loading batches to dataset
-    data_set = tf.data.Dataset.from_tensor_slices(output_tar)
-    dataset = tf.data.Dataset.zip((dataset, data_set)).batch(2000, drop_remainder=True)
-
     # preprocessing data
-    batch_count = math.floor(batch.size / 2000)
+    batch_count = input_data.get_batch_count(tar_file)
     batch_count_train = int(batch_count * 0.9)
     dataset.shuffle(int(batch_count * 1.1))
 
@@ -228,22 +199,6 @@ def run_nn(sor_file, tar_file, val_src, val_tar, window=2, val_on_dev=False):
         dataset_train = dataset.take(batch_count_train)  # training data
         dataset_val = dataset.skip(batch_count_train)  # validation data
 
-    #### begin validation
-    val_batch = get_all_batches(val_source, val_target, window)
-    val_feed_src = np.array(val_batch.source)
-    val_feed_tar = np.array(val_batch.target)
-    val_output_tar = np.array(val_batch.label)
-
-    ## dictionary to specify inputs at each input point in NN
-    val_input_list = {"I0": val_feed_src, "I1": val_feed_tar}
-    val_dataset = tf.data.Dataset.from_tensor_slices(val_input_list)
-
-    # loading batches to dataset
-    val_data_set = tf.data.Dataset.from_tensor_slices(val_output_tar)
-    val_dataset = tf.data.Dataset.zip((val_dataset, val_data_set)).batch(
-        2000, drop_remainder=True
-    )
-
     # run nn training with fit
     history = train_by_fit(
         train_model,
@@ -295,22 +250,21 @@ def hyperparam_search(sor_file, tar_file, val_src, val_tar, window=2, val_on_dev
     Starts hyperparameter search, saves best model, best params and evaluates best model
     """
     tf.config.list_physical_devices("GPU")
-    batch = Batch()
     # BUG: REQ das Label muss während das lernen immer bekannt sein. S9 Architektur in letzte VL
 
-    # store source and target file as list of words
-    src = ut.read_from_file(sor_file)
-    trg = ut.read_from_file(tar_file)
-    # store source and target file as list of words
-    val_src = ut.read_from_file(val_src)
-    val_trg = ut.read_from_file(val_tar)
-
-    # get word mapping for both training files and index files
-    source, target = batches.get_word_index(src, trg)
-    batch = get_all_batches(source, target, window)
+    # count the training words first, words pruned from the vocabulary and
+    # words only seen in the validation files are mapped to <unk>.
+    # the files are streamed, no line list of the corpus is kept
+    batches.build_vocab(
+        ut.iter_lines(sor_file), ut.iter_lines(tar_file), **config.vocab
+    )
+    batches.dic_src.store_dictionary("source_dictionary")
+    batches.dic_tar.store_dictionary("target_dictionary")
 
-    # get word mapping for both validation files and index files
-    val_source, val_target = batches.get_word_index(val_src, val_trg)
+    # windows of training and validation files are built chunk by chunk
+    # while training, or mapped from the window cache, see config.data
+    dataset = input_data.get_dataset(sor_file, tar_file, window, **config.data)
+    val_dataset = input_data.get_dataset(val_src, val_tar, window, **config.data)
 
     # initialize tuner
     tuner = RandomSearch(
@@ -325,44 +279,12 @@ def hyperparam_search(sor_file, tar_file, val_src, val_tar, window=2, val_on_dev
     # print search space summary
     print(tuner.search_space_summary())
 
-    #  creates tensors from lists
-    feed_src = np.array(batch.source)
-    feed_tar = np.array(batch.target)
-
-    output_tar = []
-    output_tar = np.array(batch.label)
-
     # train_model.model = tf.keras.models.load_model(
     #     "training_1/cp.ckpt", custom_objects={"perplexity": Perplexity}
     # )
 
-    ## dictionary to specify inputs at each input point in NN
-    input_list = {"I0": feed_src, "I1": feed_tar}
-    dataset = tf.data.Dataset.from_tensor_slices(input_list)
-
-    # loading batches to dataset
-    data_set = tf.data.Dataset.from_tensor_slices(output_tar)
-    dataset = tf.data.Dataset.zip((dataset, data_set)).batch(2000, drop_remainder=True)
-
-    #### validation data preprocessing
-    val_batch = get_all_batches(val_source, val_target, window)
-    val_feed_src = np.array(val_batch.source)
-    val_feed_tar = np.array(val_batch.target)
-    val_output_tar = []
-    val_output_tar = np.array(val_batch.label)
-
-    ## dictionary to specify inputs at each input point in NN
-    val_input_list = {"I0": val_feed_src, "I1": val_feed_tar}
-    val_dataset = tf.data.Dataset.from_tensor_slices(val_input_list)
-
-    # loading batches to dataset
-    val_data_set = tf.data.Dataset.from_tensor_slices(val_output_tar)
-    val_dataset = tf.data.Dataset.zip((val_dataset, val_data_set)).batch(
-        2000, drop_remainder=True
-    )
-
     # preprocessing data
-    batch_count = math.floor(batch.size / 2000)
+    batch_count = input_data.get_batch_count(tar_file)
     batch_count_train = int(batch_count * 0.9)
     dataset.shuffle(int(batch_count * 1.1))
 
@@ -417,11 +339,7 @@ def main():
         len(tf.config.experimental.list_physical_devices("GPU")),
         "\n" + "-" * 50,
     )
-<<<<<<< HEAD:src/test_nn.py
     if not (sys.argv[11].lower() == "true"):
-=======
-    if sys.argv[11].lower() == "true":
->>>>>>> 60332a317c1af37fbd460f82d930e957d4cc1d67:Abgabe 3/test_nn.py
         integrate_gpu()
 
     # running BPE with 7k operations on dev text
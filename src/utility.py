@@ -1,78 +1,209 @@
-import sys, time, threading
+import sys, time
+import atexit
 import os
+import collections
 import csv
-import subprocess
+import hashlib
+import mmap
+import multiprocessing
+import numpy as np
 
 cur_dir = os.path.dirname(__file__)
+cache_dir = os.path.join(cur_dir, "cache")
+# line offsets of files read so far, see get_line_index
+line_indices = {}
 
 
 def max_word_in_line(filepath):
     """returns max number of words in line"""
-    awk = (
-        "awk 'NF > max_length { max_length = NF; longest_line = $0 } END { print max_length }'"
-        + str(filepath)
-    )
-    awk = subprocess.Popen(
-        awk,
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        universal_newlines=True,
-    )
-    return awk.communicate()[0]
-
-
-# process function for animation
-def proc_function():
-    n = 20
-    for i in range(n):
-        time.sleep(1)
-        sys.stdout.write(
-            "\r"
-            + "loading... "
-            + str(i)
-            + "/"
-            + str(n)
-            + " "
-            + "{:.2f}".format(i / n * 100)
-            + "%"
-        )
-        sys.stdout.flush()
-    sys.stdout.write("\r" + "File created         \n")
-
-
-# function for animated character
-def animated_loading():
-    chars = "/—\|"
-    for char in chars:
-        sys.stdout.write("\r" + "loading... " + char)
-        time.sleep(0.1)
-        sys.stdout.flush()
-
-
-def loader():
-    proc = threading.Thread(name="process", target=proc_function)
-    proc.start()
-    while proc.isAlive():
-        animated_loading()
+    import corpus_stats
+
+    return corpus_stats.get_stats(filepath).max_length
+
+
+class Progress:
+    """
+    reports count, rate and eta of a long running loop on stderr.
+    update only adds to a counter, the clock is read every check_every
+    counts and the report is written at most every interval seconds
+    """
+
+    def __init__(self, name, total=None, check_every=1000, interval=1.0):
+        self.name = name
+        self.total = total
+        self.check_every = check_every
+        self.interval = interval
+        self.count = 0
+        self.next_check = check_every
+        self.start = self.last_report = time.monotonic()
+        # progress lines are redrawn in a terminal, otherwise only the summary
+        self.live = sys.stderr.isatty()
+
+    def update(self, n=1):
+        """adds n to the counter"""
+        self.count += n
+        if self.count >= self.next_check:
+            self.next_check = self.count + self.check_every
+            now = time.monotonic()
+            if self.live and now - self.last_report >= self.interval:
+                self.last_report = now
+                sys.stderr.write("\r" + self.get_report(now))
+                sys.stderr.flush()
+
+    def get_report(self, now):
+        """returns line with count, rate and eta"""
+        elapsed = now - self.start
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        report = self.name + ": " + str(self.count)
+        if self.total is not None:
+            report += "/" + str(self.total)
+        report += " ({:.1f}/s".format(rate)
+        if self.total is not None and rate > 0 and self.count < self.total:
+            eta = (self.total - self.count) / rate
+            report += ", eta {:d}:{:02d}".format(int(eta) // 60, int(eta) % 60)
+        return report + ")"
+
+    def close(self):
+        """writes the final report"""
+        end = "\r" if self.live else ""
+        sys.stderr.write(end + self.get_report(time.monotonic()) + " done\n")
+        sys.stderr.flush()
 
 
 # this method reads from file datei
 # returns a list of read file lines
 ## FIXME i cant understand deutsch
 def read_from_file(datei, start=0, end=-1):
+    """returns the formatted lines start to end of datei, all lines by default"""
+    if start == 0 and end == -1:
+        with open(datei, "r", encoding="utf-8") as in_file:
+            lines = in_file.read().split("\n")
+        if lines[-1] == "":
+            lines.pop()
+        return [line.strip() for line in lines]
+
+    # only the requested range is read, using the line index
+    offsets = get_line_index(datei)
+    start, end = get_line_range(offsets, start, end)
+    if start >= end:
+        return []
+    with open(datei, "rb") as in_file:
+        with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            text = buffer[offsets[start] : offsets[end]].decode("utf-8")
+    return [line.strip() for line in text.split("\n")[: end - start]]
+
+
+def iter_lines(datei, start=0, end=-1):
+    """yields the formatted lines start to end of datei lazily"""
+    with open(datei, "rb") as in_file:
+        if start > 0:
+            offsets = get_line_index(datei)
+            start, end = get_line_range(offsets, start, end)
+            in_file.seek(offsets[start])
+        for i, line in enumerate(in_file, start):
+            if i == end:
+                break
+            yield line.decode("utf-8").strip()
+
+
+def get_line_range(offsets, start, end):
+    """clips line range start to end to the lines in offsets"""
+    lines = len(offsets) - 1
+    end = lines if end == -1 else min(end, lines)
+    return min(start, end), end
+
+
+def get_line_index(datei):
+    """
+    returns array of the byte offsets where the lines of datei start, plus
+    its size. kept in memory and the cache directory until datei changes
+    """
+    stat = os.stat(datei)
+    key = os.path.abspath(datei)
+    version = (stat.st_mtime_ns, stat.st_size)
+    if key in line_indices and line_indices[key][0] == version:
+        return line_indices[key][1]
+
+    # the first two values of a cached index are mtime and size of datei
+    cache_file = get_cache_path(
+        "lines_" + hashlib.sha1(key.encode("utf-8")).hexdigest() + ".npy"
+    )
+    offsets = None
+    if os.path.exists(cache_file):
+        cached = np.load(cache_file)
+        if tuple(cached[:2]) == version:
+            offsets = cached[2:]
+    if offsets is None:
+        offsets = get_line_offsets(datei, stat.st_size)
+        with open(cache_file + ".tmp", "wb") as write_f:
+            np.save(write_f, np.concatenate((version, offsets)))
+        os.replace(cache_file + ".tmp", cache_file)
+
+    line_indices[key] = (version, offsets)
+    return offsets
+
+
+def get_line_offsets(datei, size, block_size=1 << 24):
+    """
+    scans datei for newlines block_size bytes at a time,
+    returns the offsets of its lines and size
+    """
+    if size == 0:
+        return np.zeros(1, dtype=np.int64)
+    parts = [np.zeros(1, dtype=np.int64)]
+    pos = 0
+    with open(datei, "rb") as in_file:
+        for block in iter(lambda: in_file.read(block_size), b""):
+            newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10)
+            parts.append(newlines.astype(np.int64) + pos + 1)
+            pos += len(block)
+    offsets = np.concatenate(parts)
+    # the last line has no line break
+    if offsets[-1] != size:
+        offsets = np.append(offsets, size)
+    return offsets
+
+
+def read_chunks(datei, size=10000):
+    """reads datei lazily, yields lists of at most size formatted lines"""
     with open(datei, "r", encoding="utf-8") as in_file:
-        res = []
-        lines = in_file.readlines()
+        chunk = []
+        for line in in_file:
+            chunk.append(line.strip())
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def ordered_map(pool, func, iterable, ahead=16):
+    """
+    like pool.imap but keeps at most ahead tasks in flight,
+    so iterable is only consumed as fast as the results are used
+    """
+    pending = collections.deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= ahead:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
 
-        if end == -1:
-            end = len(lines)
 
-        # append list res with formatted lines
-        for i, line in enumerate(lines):
-            if i in range(start, end):
-                res.append(line.strip())
-    return res
+def get_file_hash(datei):
+    """returns sha1 hex digest of the content of datei"""
+    sha = hashlib.sha1()
+    with open(datei, "rb") as in_file:
+        for block in iter(lambda: in_file.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def get_cache_path(name):
+    """returns path of name inside the cache directory"""
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, name)
 
 
 def save_as_csv(file_des, data):
@@ -114,13 +245,117 @@ def save_list_as_txt(file_des, data_list):
 
 
 def save_line_as_txt(file_des, line):
-    """ Saves data_line as csv in file_des """
-    mode = ""
-    if os.path.exists(file_des):
-        mode = "a"
-    else:
-        mode = "w"
-
-    with open(file_des, mode, encoding="utf-8") as write_f:
-        write_f.write(line)
-        write_f.write("\n")
\ No newline at end of file
+    """ Appends line to file_des, buffered by writer_pool """
+    if multiprocessing.parent_process() is not None:
+        # pool workers exit without atexit, a buffer would be lost there
+        with open(file_des, "a", encoding="utf-8") as write_f:
+            write_f.write(line + "\n")
+        return
+    writer_pool.get(file_des).write(line + "\n")
+
+
+class BufferedFile:
+    """
+    output file of a WriterPool, collects the written text and writes it
+    once flush_size characters are buffered or flush_time seconds passed.
+    an atomic file is written to file_des.tmp and renamed by finalize
+    """
+
+    def __init__(self, pool, file_des, atomic=False):
+        self.pool = pool
+        self.file_des = file_des
+        self.atomic = atomic
+        self.path = file_des + ".tmp" if atomic else file_des
+        self.handle = None
+        self.buffer = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+        if atomic:
+            open(self.path, "w").close()
+
+    def write(self, text):
+        """buffers text, writes the buffer if a threshold is reached"""
+        self.buffer.append(text)
+        self.size += len(text)
+        if (
+            self.size >= self.pool.flush_size
+            or time.monotonic() - self.last_flush >= self.pool.flush_time
+        ):
+            self.flush()
+
+    def flush(self):
+        """writes the buffered text to the file"""
+        if self.buffer:
+            if self.handle is None:
+                self.pool.open_handle(self)
+            elif self.path in self.pool.open_files:
+                # an evicted file is flushed after it left open_files
+                self.pool.open_files.move_to_end(self.path)
+            self.handle.write("".join(self.buffer))
+            self.handle.flush()
+            self.buffer, self.size = [], 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        """flushes and closes the handle, the next write opens it again"""
+        self.flush()
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+class WriterPool:
+    """
+    keeps buffered output files by path, at most max_open of them have an
+    open handle at a time, the least recently written one is closed first
+    """
+
+    def __init__(self, flush_size=1 << 20, flush_time=5.0, max_open=64):
+        self.flush_size = flush_size
+        self.flush_time = flush_time
+        self.max_open = max_open
+        self.files = {}
+        self.open_files = collections.OrderedDict()
+
+    def get(self, file_des, atomic=False):
+        """returns the buffered file of file_des, opens it on first use"""
+        if file_des not in self.files:
+            self.files[file_des] = BufferedFile(self, file_des, atomic)
+        return self.files[file_des]
+
+    def open_handle(self, buffered):
+        """opens the handle of buffered, closing the oldest one if needed"""
+        while len(self.open_files) >= self.max_open:
+            self.open_files.popitem(last=False)[1].close()
+        buffered.handle = open(buffered.path, "a", newline="", encoding="utf-8")
+        self.open_files[buffered.path] = buffered
+
+    def finalize(self, file_des):
+        """writes and closes file_des, renames it into place if it is atomic"""
+        buffered = self.files.pop(file_des)
+        buffered.close()
+        self.open_files.pop(buffered.path, None)
+        if buffered.atomic:
+            os.replace(buffered.path, file_des)
+
+    def flush(self):
+        """writes the buffers of all files"""
+        for buffered in self.files.values():
+            buffered.flush()
+
+    def close(self):
+        """
+        closes all files, atomic files that were not finalized keep their
+        .tmp name so incomplete output never replaces a file
+        """
+        for file_des in [f for f, b in self.files.items() if not b.atomic]:
+            self.finalize(file_des)
+        for buffered in self.files.values():
+            buffered.close()
+        self.files.clear()
+        self.open_files.clear()
+
+
+# shared by all writers of the process, written out when python exits
+writer_pool = WriterPool()
+atexit.register(writer_pool.close)
\ No newline at end of file
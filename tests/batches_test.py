@@ -0,0 +1,153 @@
+"""
+Automated test file for batches.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+currentdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(currentdir), "src"))
+
+
+import batches
+import utility
+
+
+def random_lines(rand, count, vocab):
+    """returns count lines of 0 to 12 random words"""
+    return [
+        " ".join(rand.choice(vocab) for _ in range(rand.randint(0, 12)))
+        for _ in range(count)
+    ]
+
+
+class TestBatches(unittest.TestCase):
+    def setUp(self):
+        # fresh module dictionaries for every test
+        batches.dic_src.__init__()
+        batches.dic_tar.__init__()
+        rand = random.Random(7)
+        self.src = random_lines(rand, 50, ["der", "mann", "liest", "die", "zeitung"])
+        self.trg = random_lines(rand, 50, ["the", "man", "reads", "a", "paper", "."])
+
+    def tearDown(self):
+        batches.dic_src.__init__()
+        batches.dic_tar.__init__()
+
+    def test_batch_arrays(self):
+        for w in (1, 2, 3):
+            source, target = batches.get_word_index(self.src, self.trg)
+            batch = batches.get_all_batches(source, target, w)
+            arrays = batches.create_batch_arrays(
+                *batches.get_word_arrays(self.src, self.trg), w
+            )
+            expected = (batch.source, batch.target, batch.label)
+            for array, rows in zip(arrays, expected):
+                np.testing.assert_array_equal(array, np.array(rows))
+
+    def test_iter_batches(self):
+        arrays = batches.create_batch_arrays(
+            *batches.get_word_arrays(self.src, self.trg), 2
+        )
+        rows = len(arrays[2])
+        # chunks smaller and larger than a batch
+        chunks = [tuple(a[i : i + 70] for a in arrays) for i in range(0, rows, 70)]
+        sizes = []
+        for i, batch in enumerate(batches.iter_batches(chunks, batch_size=50)):
+            sizes.append(batch.size)
+            expected = (batch.source, batch.target, batch.label)
+            for array, batch_rows in zip(arrays, expected):
+                np.testing.assert_array_equal(array[i * 50 : i * 50 + 50], batch_rows)
+        self.assertEqual(sizes, [50] * (rows // 50) + [rows % 50])
+
+    def test_next_batch(self):
+        source, target = batches.get_word_index(self.src, self.trg)
+        batch = batches.get_all_batches(source, target, 2)
+        rows = list(zip(batch.source, batch.target, batch.label))
+        batch, rest = batches.get_next_batch(batch, source[0], target[0])
+        self.assertEqual((batch.size, len(batch.source)), (200, 200))
+        batch_rows = list(zip(batch.source, batch.target, batch.label))
+        self.assertEqual(batch_rows, rows[:200])
+        self.assertEqual(rest.size, len(rest.label))
+        self.assertEqual(rest.label[: len(rows) - 200], [r[2] for r in rows[200:]])
+
+    def test_lookup_word_index(self):
+        source, target = batches.get_word_index(self.src[:25], self.trg[:25])
+        size = len(batches.dic_src), len(batches.dic_tar)
+        # dictionaries without <unk> are indexed like get_word_index
+        self.assertEqual(
+            batches.lookup_word_index(self.src[:25], self.trg[:25]), (source, target)
+        )
+        batches.dic_src.freeze("<unk>")
+        batches.dic_tar.freeze("<unk>")
+        unk = batches.dic_src.get_index("<unk>")
+        src, _ = batches.lookup_word_index(["mann hund"], ["the dog"])
+        self.assertEqual(src, [[batches.dic_src.get_index("mann"), unk]])
+        # only <unk> was added
+        self.assertEqual(len(batches.dic_src), size[0] + 1)
+        self.assertEqual(len(batches.dic_tar), size[1] + 1)
+
+    def test_rnn_arrays(self):
+        source, target = batches.get_word_index(self.src, self.trg)
+        max_line = max(len(line) for line in source + target)
+        arrays = batches.get_rnn_arrays(*batches.get_word_arrays(self.src, self.trg))
+        for s, t, s_row, t_row, l_row in zip(source, target, *arrays):
+            s_pad, t_pad = [0] * (max_line - len(s) + 1), [0] * (max_line - len(t))
+            self.assertEqual(s_row.tolist(), [1] + s + [2] + s_pad)
+            self.assertEqual(t_row.tolist(), [1] + t + [2] + t_pad)
+            self.assertEqual(l_row.tolist(), t + [2] + t_pad + [1])
+
+    def test_rnn_buckets(self):
+        source, target = batches.get_word_index(self.src, self.trg)
+        pairs = []
+        buckets = batches.get_rnn_buckets(
+            *batches.get_word_arrays(self.src, self.trg), token_budget=60
+        )
+        for batch in buckets:
+            self.assertLessEqual(batch.source.size, 60)
+            bucket = [
+                (s_row[1 : s_row.index(2)], t_row[: t_row.index(2)])
+                for s_row, t_row in zip(batch.source.tolist(), batch.label.tolist())
+            ]
+            # padded to the longest line of the bucket only
+            max_line = max(max(len(s), len(t)) for s, t in bucket)
+            self.assertEqual(batch.source.shape[1], max_line + 3)
+            pairs.extend(bucket)
+        self.assertEqual(sorted(pairs), sorted(zip(source, target)))
+
+    def test_window_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = utility.cache_dir
+            utility.cache_dir = os.path.join(tmp_dir, "cache")
+            try:
+                files = []
+                for name, lines in [("s.de", self.src), ("t.en", self.trg)]:
+                    files.append(os.path.join(tmp_dir, name))
+                    with open(files[-1], "w", encoding="utf-8") as write_f:
+                        write_f.write("\n".join(lines) + "\n")
+                with self.assertRaises(ValueError):
+                    batches.get_window_cache(*files)
+
+                batches.build_vocab(self.src, self.trg)
+                expected = batches.create_batch_arrays(
+                    *batches.get_word_arrays(self.src, self.trg), 2
+                )
+                for _ in range(2):
+                    # the second call maps the files of the first one
+                    arrays = batches.get_window_cache(*files, chunk_size=7)
+                    for array, rows in zip(arrays, expected):
+                        self.assertIsInstance(array, np.memmap)
+                        np.testing.assert_array_equal(array, rows)
+                    self.assertEqual(len(os.listdir(utility.cache_dir)), 5)
+                    del arrays
+            finally:
+                utility.cache_dir = cache_dir
+                utility.line_indices.clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Automated test file for corpus_stats.py
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+currentdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(currentdir), "src"))
+
+
+import corpus_stats
+import utility
+
+
+class TestCorpusStats(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = utility.cache_dir
+        utility.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        self.files = []
+        for name, text in [("a.de", "ein mann lacht\n\nein hund\n"), ("b.en", "a")]:
+            self.files.append(os.path.join(self.tmp_dir.name, name))
+            with open(self.files[-1], "w", encoding="utf-8") as write_f:
+                write_f.write(text)
+
+    def tearDown(self):
+        utility.cache_dir = self.cache_dir
+        self.tmp_dir.cleanup()
+
+    def test_stats(self):
+        stats = corpus_stats.get_stats(self.files[0])
+        self.assertEqual(stats.lines, 3)
+        self.assertEqual(stats.running_words, 5)
+        self.assertEqual(stats.distinct_words, 4)
+        self.assertEqual(stats.max_length, 3)
+        self.assertEqual(stats.histogram, {0: 1, 2: 1, 3: 1})
+        self.assertAlmostEqual(stats.avg_length(), 5 / 3)
+        self.assertEqual(utility.max_word_in_line(self.files[0]), 3)
+
+        # the second call reads the cached result
+        cached = corpus_stats.get_stats(self.files[0])
+        self.assertEqual(cached.to_dict(), stats.to_dict())
+        self.assertEqual(len(os.listdir(utility.cache_dir)), 1)
+
+    def test_parallel(self):
+        stats = corpus_stats.get_all_stats(self.files, jobs=2)
+        self.assertEqual([s.running_words for s in stats], [5, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Automated test file for dictionary.py
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+currentdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(currentdir), "src"))
+
+
+from dictionary import Dictionary, attach_dictionary, share_dictionary
+
+
+class TestDictionary(unittest.TestCase):
+    def setUp(self):
+        self.dic = Dictionary()
+        self.dic.update("<s>", "</s>", "ein", "mann", "ein")
+
+    def test_lookup(self):
+        self.assertEqual(len(self.dic), 4)
+        for i, word in enumerate(["<s>", "</s>", "ein", "mann"]):
+            self.assertEqual(self.dic.get_index(word), i)
+            self.assertEqual(self.dic.get_word(i), word)
+        self.assertIs(self.dic.get_keys(), self.dic.get_keys())
+
+    def test_translate(self):
+        lines = ["ein mann", "", "ein hund rennt"]
+        nums, offsets = self.dic.translate_to_nums(lines)
+        self.assertEqual(nums.dtype, np.uint16)
+        self.assertEqual(nums.tolist(), [2, 3, 2, 4, 5])
+        self.assertEqual(offsets.tolist(), [0, 2, 2, 5])
+        self.assertEqual(self.dic.translate_to_words(nums, offsets), lines)
+        self.assertEqual(self.dic.translate_to_words(nums[:2]), "ein mann")
+        self.assertEqual(self.dic.translate_to_words([]), "")
+
+    def test_translate_unknown(self):
+        nums, offsets = self.dic.translate_to_nums(["ein katze"], unk="<s>")
+        self.assertEqual(nums.tolist(), [2, 0])
+        self.assertEqual(len(self.dic), 4)
+
+        # an unk missing from the dictionary is added once
+        nums, _ = self.dic.translate_to_nums(["ein katze hund"], unk="<unk>")
+        self.assertEqual(nums.tolist(), [2, 4, 4])
+        self.assertEqual(self.dic.get_keys()[4:], ["<unk>"])
+
+    def test_prune_and_freeze(self):
+        dic = Dictionary()
+        dic.translate_to_nums(["a b b c c c", "d c b"])
+        self.assertEqual(dic.counts.tolist(), [1, 3, 4, 1])
+
+        dic.prune(min_count=2, keep=("<s>", "<unk>"))
+        self.assertEqual(dic.get_keys(), ["<s>", "<unk>", "c", "b"])
+        self.assertEqual(dic.counts.tolist(), [0, 0, 4, 3])
+        dic.prune(max_size=3, keep=("<s>", "<unk>"))
+        self.assertEqual(dic.get_keys(), ["<s>", "<unk>", "c"])
+
+        dic.freeze("<unk>")
+        nums, _ = dic.translate_to_nums(["c b e"])
+        self.assertEqual(nums.tolist(), [2, 1, 1])
+        dic.update("e")
+        self.assertEqual(len(dic), 3)
+
+        # pruning a frozen dictionary keeps unk and renumbers it
+        dic.prune(keep=("c",))
+        self.assertEqual(dic.get_keys(), ["c", "<unk>"])
+        self.assertEqual(dic.get_word(dic.unk_index), "<unk>")
+
+    def test_binary_table(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file_des = os.path.join(tmp, "dictionary")
+            self.dic.update("straße")
+            self.dic.store_dictionary(file_des)
+            stored = Dictionary()
+            stored.get_stored(file_des)
+            self.assertIsNotNone(stored.table)
+            self.assertEqual(len(stored), 5)
+            self.assertEqual(stored.get_index("straße"), 4)
+            self.assertEqual(stored.get_word(2), "ein")
+            self.assertRaises(KeyError, stored.get_index, "hund")
+            self.assertIn("ein", stored)
+            self.assertNotIn("hund", stored)
+            self.assertEqual(stored.get("hund", 3), 3)
+
+            # lookups and translations read the table without copying it
+            nums, _ = stored.translate_to_nums(["ein hund"], unk="<s>")
+            self.assertEqual(stored.translate_to_words(nums), "ein <s>")
+            self.assertIsNotNone(stored.table)
+
+            # a frozen dictionary is not copied by updates
+            frozen = Dictionary()
+            frozen.load_table(stored.table)
+            frozen.unk_index = 0
+            frozen.update("hund")
+            self.assertIsNotNone(frozen.table)
+
+            # the first update copies the table into memory
+            stored.update("hund")
+            self.assertIsNone(stored.table)
+            self.assertEqual(stored.get_keys(), self.dic.get_keys() + ["hund"])
+
+    def test_stored_frozen(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file_des = os.path.join(tmp, "dictionary")
+            self.dic.freeze("<unk>")
+            self.dic.store_dictionary(file_des)
+            # mapped into an empty dictionary and added to a filled one
+            mapped, merged = Dictionary(), Dictionary()
+            merged.update("<s>")
+            for stored in (mapped, merged):
+                stored.get_stored(file_des)
+                # words only seen in validation data become <unk>
+                nums, _ = stored.translate_to_nums(["ein hund"])
+                self.assertEqual(nums.tolist(), [2, 4])
+                self.assertEqual(len(stored), 5)
+
+    def test_shared_memory(self):
+        shm = share_dictionary(self.dic)
+        try:
+            shared = Dictionary()
+            attach_dictionary(shared, shm.name)
+            self.assertEqual(len(shared), 4)
+            self.assertEqual(shared.get_index("mann"), 3)
+            self.assertEqual(shared.get_word(2), "ein")
+            shared.table.close()
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+"""
+Automated test file for encoder.py
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+currentdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(currentdir), "src"))
+
+
+import encoder
+import utility
+
+CORPUS = [
+    "der mann liest die zeitung in der bahn",
+    "die frau liest den roman , der mann lacht",
+    "ein hund rennt über die wiese und der hund bellt",
+    "lesen lesen leser lesenden",
+]
+
+
+def naive_op_sequences(lis_lines, n):
+    """recounts all pairs for every merge, used as reference"""
+    op_sequences = []
+    word_tab = encoder.get_words(lis_lines)
+    for _ in range(n):
+        tmp_table = encoder.Table()
+        for key, value in word_tab.tabular.items():
+            sym_list = key.split()
+            for j in range(len(sym_list) - 1):
+                pair = sym_list[j] + " " + sym_list[j + 1]
+                tmp_table.update_pairs(pair)
+                tmp_table.tabular[pair] += value - 1
+        if not tmp_table.tabular:
+            break
+        max_pair = tmp_table.get_highest_pair()
+        op_sequences.append(max_pair)
+        word_tab = encoder.merge_sqnce(word_tab, max_pair)
+    return op_sequences
+
+
+class TestEncoder(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.corpus = os.path.join(self.tmp_dir.name, "corpus.de")
+        with open(self.corpus, "w", encoding="utf-8") as write_f:
+            write_f.write("\n".join(CORPUS) + "\n")
+        self.cache_dir = utility.cache_dir
+        utility.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        self.cur_dir = utility.cur_dir
+        utility.cur_dir = self.tmp_dir.name
+        os.mkdir(os.path.join(self.tmp_dir.name, "output"))
+
+    def tearDown(self):
+        utility.cache_dir = self.cache_dir
+        utility.cur_dir = self.cur_dir
+        self.tmp_dir.cleanup()
+
+    def test_learner_matches_recount(self):
+        for n in (1, 10, 40, 200):
+            self.assertEqual(
+                encoder.get_op_sequences(self.corpus, n),
+                naive_op_sequences(CORPUS, n),
+                msg="incremental learner differs at " + str(n) + " merges",
+            )
+
+    def test_jobs_match_single_process(self):
+        self.assertEqual(
+            encoder.get_op_sequences(self.corpus, 60, jobs=2),
+            encoder.get_op_sequences(self.corpus, 60),
+        )
+
+    def test_count_words_is_cached(self):
+        word_tab = encoder.get_words(CORPUS)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(encoder.count_words(self.corpus).tabular, word_tab.tabular)
+        self.assertEqual(out.getvalue(), "")
+        self.assertEqual(len(os.listdir(utility.cache_dir)), 1)
+
+        # cached counts keep the order of first occurrence
+        cached = encoder.count_words(self.corpus, jobs=2).tabular
+        self.assertEqual(list(cached.items()), list(word_tab.tabular.items()))
+
+    def test_resume_from_state(self):
+        encoder.create_op_sequences(self.corpus, 30, checkpoint=7)
+        output = os.listdir(os.path.join(self.tmp_dir.name, "output"))
+        self.assertEqual(output, ["corpus_op_sequence_30.de.csv"])
+        learner = encoder.learn_op_sequences(self.corpus, 60)
+        self.assertEqual(learner.op_sequences, encoder.get_op_sequences(self.corpus, 60))
+
+        # shorter runs are a prefix of the saved state
+        encoder.create_op_sequences(self.corpus, 20)
+        self.assertEqual(
+            utility.read_from_file(
+                os.path.join(self.tmp_dir.name, "output", "corpus_op_sequence_20.de.csv")
+            ),
+            learner.op_sequences[:20],
+        )
+
+    def test_all_op_sequences_in_one_run(self):
+        seq_files = encoder.create_all_op_sequences(
+            self.corpus, [30, 10], split_files=[self.corpus]
+        )
+        op_sequences = encoder.get_op_sequences(self.corpus, 30)
+        for n, seq_file in zip((10, 30), seq_files):
+            self.assertEqual(utility.read_from_file(seq_file), op_sequences[:n])
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(
+                        self.tmp_dir.name, "output", "corpus_subword_" + str(n) + ".de"
+                    )
+                )
+            )
+
+    def test_segmenter_matches_learned_words(self):
+        learner = encoder.Learner(encoder.get_words(CORPUS))
+        for _ in range(25):
+            learner.merge()
+        segmenter = encoder.Segmenter(seq.split() for seq in learner.op_sequences)
+        for key, sym_list in zip(encoder.get_words(CORPUS).tabular, learner.words):
+            word = key.replace(" ", "")[: -len("</w>")]
+            self.assertEqual(list(segmenter.segment(word)), sym_list)
+
+    def test_split_line(self):
+        segmenter = encoder.Segmenter([("l", "e"), ("le", "s"), ("les", "e")])
+        self.assertEqual(segmenter.split_line("lesen lesen"), "lese@@ n lese@@ n")
+
+    def test_parallel_subword_split_keeps_order(self):
+        seq_file = encoder.create_op_sequences(self.corpus, 40)
+        out = os.path.join(self.tmp_dir.name, "output", "split")
+        encoder.subword_split(self.corpus, seq_file, file_des=out + "1")
+        encoder.subword_split(
+            self.corpus, seq_file, file_des=out + "2", jobs=2, chunk_size=1
+        )
+
+        segmenter = encoder.Segmenter(encoder.load_merges(seq_file))
+        expected = [segmenter.split_line(line) for line in CORPUS]
+        self.assertEqual(utility.read_from_file(out + "1"), expected)
+        self.assertEqual(utility.read_from_file(out + "2"), expected)
+
+    def test_revert_bpe(self):
+        lines = ["<s> ein m@@ ann l@@ iest </s>", "z@@ wei"]
+        self.assertEqual(list(encoder.revert_lines(lines)), ["ein mann liest ", "zwei"])
+
+        dic = encoder.dictionary.Dictionary()
+        dic.update("<s>", "</s>", "z@@", "wei")
+        self.assertEqual(list(encoder.revert_ids([[0, 2, 3, 1]], dic)), ["zwei "])
+
+        encoder.revert_bpe_files([self.corpus])
+        self.assertEqual(utility.read_from_file(self.corpus), CORPUS)
+
+    def test_joint_op_sequences(self):
+        corpus_en = os.path.join(self.tmp_dir.name, "corpus.en")
+        with open(corpus_en, "w", encoding="utf-8") as write_f:
+            write_f.write("the man reads the paper\nthe dog barks\n")
+
+        seq_file = encoder.create_joint_op_sequences([self.corpus, corpus_en], [20])[0]
+        self.assertTrue(seq_file.endswith("corpus_op_sequence_20.de-en.csv"))
+        self.assertEqual(len(utility.read_from_file(seq_file)), 20)
+
+        word_tab, file_freqs = encoder.count_joint_words([self.corpus, corpus_en])
+        self.assertEqual(file_freqs[1]["the"], 3)
+        self.assertEqual(word_tab.tabular["d e r</w>"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Automated test file for utility.py
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+
+currentdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(currentdir), "src"))
+
+
+import utility
+
+
+def save_lines(file_des):
+    """writes two lines from a pool worker"""
+    for line in ("erste", "zweite"):
+        utility.save_line_as_txt(file_des, line)
+
+
+class TestUtility(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp_dir.name, "lines.txt")
+        with open(self.file, "w", encoding="utf-8") as write_f:
+            write_f.write("erste zeile \n\nüber die brücke\r\nletzte")
+        self.cache_dir = utility.cache_dir
+        utility.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+
+    def tearDown(self):
+        utility.cache_dir = self.cache_dir
+        utility.line_indices.clear()
+        self.tmp_dir.cleanup()
+
+    def test_line_ranges(self):
+        lines = ["erste zeile", "", "über die brücke", "letzte"]
+        self.assertEqual(utility.read_from_file(self.file), lines)
+        for start, end in [(1, 3), (2, -1), (3, 10), (5, -1)]:
+            expected = lines[start:] if end == -1 else lines[start:end]
+            self.assertEqual(utility.read_from_file(self.file, start, end), expected)
+            self.assertEqual(list(utility.iter_lines(self.file, start, end)), expected)
+
+    def test_line_index_invalidated(self):
+        self.assertEqual(len(utility.get_line_index(self.file)), 5)
+        with open(self.file, "a", encoding="utf-8") as write_f:
+            write_f.write("\nnoch eine\n")
+        self.assertEqual(utility.read_from_file(self.file, 4), ["noch eine"])
+
+        # a new process reads the index from the cache directory
+        utility.line_indices.clear()
+        offsets = utility.get_line_index(self.file)
+        self.assertEqual(offsets[-1], os.path.getsize(self.file))
+        # newlines at block borders are found once
+        blocks = utility.get_line_offsets(self.file, offsets[-1], block_size=3)
+        self.assertEqual(blocks.tolist(), offsets.tolist())
+
+    def test_writer_pool(self):
+        pool = utility.WriterPool(flush_size=10, max_open=1)
+        out = os.path.join(self.tmp_dir.name, "out.txt")
+        atomic = os.path.join(self.tmp_dir.name, "atomic.txt")
+        pool.get(out).write("kurz\n")
+        pool.get(atomic, atomic=True).write("eine längere zeile\n")
+        self.assertFalse(os.path.exists(atomic))
+        self.assertFalse(os.path.exists(out))
+
+        pool.get(out).write("und noch mehr\n")
+        pool.finalize(atomic)
+        pool.close()
+        self.assertEqual(utility.read_from_file(out), ["kurz", "und noch mehr"])
+        self.assertEqual(utility.read_from_file(atomic), ["eine längere zeile"])
+
+    def test_writer_pool_evict(self):
+        pool = utility.WriterPool(flush_size=10, max_open=2)
+        paths = [os.path.join(self.tmp_dir.name, n + ".txt") for n in "abc"]
+        pool.get(paths[0]).write("a" * 20 + "\n")
+        pool.get(paths[0]).write("b")
+        pool.get(paths[1]).write("c" * 20 + "\n")
+        # opening c evicts a, whose buffer is written before it is closed
+        pool.get(paths[2]).write("d" * 20 + "\n")
+        self.assertEqual(utility.read_from_file(paths[0]), ["a" * 20, "b"])
+        self.assertEqual(list(pool.open_files), paths[1:])
+        pool.close()
+        self.assertEqual(utility.read_from_file(paths[2]), ["d" * 20])
+
+    def test_save_line_in_worker(self):
+        out = os.path.join(self.tmp_dir.name, "worker.txt")
+        # the pool is terminated on exit, its workers never run atexit
+        with multiprocessing.Pool(1) as pool:
+            pool.apply(save_lines, (out,))
+        self.assertEqual(utility.read_from_file(out), ["erste", "zweite"])
+
+    def test_progress(self):
+        progress = utility.Progress("lines", total=10, check_every=4)
+        for _ in range(10):
+            progress.update()
+        self.assertEqual(progress.count, 10)
+        self.assertEqual(progress.next_check, 12)
+        report = progress.get_report(progress.start + 2)
+        self.assertEqual(report, "lines: 10/10 (5.0/s)")
+        progress.count = 5
+        report = progress.get_report(progress.start + 5)
+        self.assertEqual(report, "lines: 5/10 (1.0/s, eta 0:05)")
+        progress.close()
+
+
+if __name__ == "__main__":
+    unittest.main()